@@ -1,63 +1,45 @@
 import numpy as np
-from analyzers.data import data, league_yellow, weighted_avg
+from analyzers.counts import over_probs
+from analyzers.data import current
+from analyzers.metrics import span
+from analyzers.render import render_cards
 
-def run(home, away, last_matches=10, simulations=1000):
-    # Проверка за налични колони
-    required_cols = ['HY','AY','HF','AF']
-    missing_cols = [c for c in required_cols if c not in data.columns]
-    if missing_cols:
-        return f"<p>⚠️ CSV файловете нямат необходимите колони: {', '.join(missing_cols)}</p>"
+THRESHOLDS = (1.5, 2.5, 3.5, 4.5, 5.5)
 
-    # Исторически данни за домакин и гост
-    df_home = data[(data['HomeTeam']==home) | (data['AwayTeam']==home)]
-    df_away = data[(data['HomeTeam']==away) | (data['AwayTeam']==away)]
+def analyze(home, away, last_matches=10):
+    league = current().league_for(home, away)
 
-    # Средни жълти картони
-    home_y = weighted_avg(df_home[df_home['HomeTeam']==home], 'HY', last_matches)
-    away_y = weighted_avg(df_away[df_away['AwayTeam']==away], 'AY', last_matches)
+    # Проверка за налични колони (в поне един мач на лигата)
+    required_cols = ['HY','AY','HF','AF']
+    missing_cols = [c for c in required_cols if not league.has_counts([c])]
+    if missing_cols:
+        return {'home': home, 'away': away, 'missing_columns': missing_cols}
 
-    # Средни фолове
-    home_fouls = weighted_avg(df_home[df_home['HomeTeam']==home], 'HF', last_matches)
-    away_fouls = weighted_avg(df_away[df_away['AwayTeam']==away], 'AF', last_matches)
+    # Средни жълти картони и фалове - изчислени при зареждане за всеки отбор и терен
+    home_y = league.count_rate(home, True, 'HY', last_matches)
+    away_y = league.count_rate(away, False, 'AY', last_matches)
+    home_fouls = league.count_rate(home, True, 'HF', last_matches)
+    away_fouls = league.count_rate(away, False, 'AF', last_matches)
 
-    # Ако няма данни, използваме лигова средна или фиктивни стойности
-    home_y = home_y if not np.isnan(home_y) else (league_yellow/2 if league_yellow else 1.5)
-    away_y = away_y if not np.isnan(away_y) else (league_yellow/2 if league_yellow else 1.5)
-    home_fouls = home_fouls if not np.isnan(home_fouls) else 10
-    away_fouls = away_fouls if not np.isnan(away_fouls) else 10
+    # Ако няма данни, използваме средните на лигата
+    home_y = home_y if not np.isnan(home_y) else league.count_means['HY']
+    away_y = away_y if not np.isnan(away_y) else league.count_means['AY']
+    home_fouls = home_fouls if not np.isnan(home_fouls) else league.count_means['HF']
+    away_fouls = away_fouls if not np.isnan(away_fouls) else league.count_means['AF']
 
     # Комбиниране на метриките за Poisson λ
     alpha, beta = 0.7, 0.3
-    lambda_home = alpha*home_y + beta*(home_fouls/5)
-    lambda_away = alpha*away_y + beta*(away_fouls/5)
-
-    # Poisson симулации
-    samples_home = np.random.poisson(max(0.2, lambda_home), simulations)
-    samples_away = np.random.poisson(max(0.2, lambda_away), simulations)
-    samples_total = samples_home + samples_away
-
-    # Over X за всеки отбор
-    overs_home = {f"Over {x}.5": np.mean(samples_home > x)*100 for x in [1,2,3,4,5]}
-    overs_away = {f"Over {x}.5": np.mean(samples_away > x)*100 for x in [1,2,3,4,5]}
-    overs_total = {f"Over {x}.5": np.mean(samples_total > x)*100 for x in [1,2,3,4,5]}
-
-    # HTML резултат
-    html = f"<h2>{home} 🆚 {away}</h2>"
-    html += "<p><b>🟨 Анализ: Жълти картони и дисциплина</b></p>"
-
-    html += f"<p><b>{home} - вероятности за Over:</b></p><ul>"
-    for k,v in overs_home.items():
-        html += f"<li>{k}: {v:.1f}%</li>"
-    html += "</ul>"
-
-    html += f"<p><b>{away} - вероятности за Over:</b></p><ul>"
-    for k,v in overs_away.items():
-        html += f"<li>{k}: {v:.1f}%</li>"
-    html += "</ul>"
-
-    html += f"<p><b>Общо картони - вероятности за Over:</b></p><ul>"
-    for k,v in overs_total.items():
-        html += f"<li>{k}: {v:.1f}%</li>"
-    html += "</ul>"
-
-    return html
+    lambda_home = max(0.2, alpha*home_y + beta*(home_fouls/5))
+    lambda_away = max(0.2, alpha*away_y + beta*(away_fouls/5))
+
+    # Over X за всеки отбор и общо - точни Poisson опашки, едно извикване
+    with span('count_markets'):
+        probs = over_probs([lambda_home, lambda_away, lambda_home + lambda_away], THRESHOLDS)
+
+    result = {'home': home, 'away': away, 'cards_home': float(lambda_home), 'cards_away': float(lambda_away)}
+    for i, side in enumerate(('home', 'away', 'total')):
+        result.update({f'over_{side}_{t}': float(p) for t, p in zip(THRESHOLDS, probs[i])})
+    return result
+
+def run(home, away, last_matches=10):
+    return render_cards(analyze(home, away, last_matches))
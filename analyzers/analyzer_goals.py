@@ -1,36 +1,28 @@
-import numpy as np
-from analyzers.data import data, mean_home_goals, mean_away_goals, team_strength, normalize_implied
-from scipy.stats import poisson
+from analyzers.data import current
+from analyzers.metrics import span
+from analyzers.render import render_goals
+from analyzers.score_matrix import score_matrix, over_probs
 
-def run(home, away, simulations=3000):
-    home_attack, home_defense, _ = team_strength(home, True)
-    away_attack, away_defense, _ = team_strength(away, False)
+def analyze(home, away, strength=None):
+    league = current().league_for(home, away)
+    data = league.data
 
-    lambda_home = mean_home_goals * (home_attack / max(0.1, away_defense))
-    lambda_away = mean_away_goals * (away_attack / max(0.1, home_defense))
-    lambda_home = float(np.clip(lambda_home, 0.1, 5.0))
-    lambda_away = float(np.clip(lambda_away, 0.1, 5.0))
+    with span('lambda'):
+        lambda_home, lambda_away = league.match_lambdas(home, away, strength)
 
-    # моделна probability for total goals > k can be computed exactly using Poisson convolution,
-    # but for simplicity и consistency с останалата част използваме симулация
-    totals = []
-    for _ in range(simulations):
-        gh = np.random.poisson(lambda_home)
-        ga = np.random.poisson(lambda_away)
-        totals.append(gh+ga)
-
-    over_0_5 = sum(1 for t in totals if t > 0) / len(totals)
-    over_1_5 = sum(1 for t in totals if t > 1) / len(totals)
-    over_2_5 = sum(1 for t in totals if t > 2) / len(totals)
-    over_3_5 = sum(1 for t in totals if t > 3) / len(totals)
+    # моделната вероятност за общо голове > k идва точно от матрицата на резултатите
+    overs = over_probs(score_matrix(lambda_home, lambda_away), (0.5, 1.5, 2.5, 3.5))
+    result = {'home': home, 'away': away, 'lambda_home': lambda_home, 'lambda_away': lambda_away}
+    result.update({f'over_{line}': float(p) for line, p in overs.items()})
+    over_2_5 = result['over_2.5']
+    imp_p_over = None
 
     # използваме пазарните Avg>2.5 / Avg<2.5 за корекция ако налични
     if 'Avg>2.5' in data.columns and 'Avg<2.5' in data.columns:
         # Взимаме първия ред просто да прочетем пазарния average (позицията не важи, само колоните)
-        row = data.iloc[0]
         try:
-            odd_over = float(row['Avg>2.5'])
-            odd_under = float(row['Avg<2.5'])
+            odd_over = float(data['Avg>2.5'].iat[0])
+            odd_under = float(data['Avg<2.5'].iat[0])
             imp_over = 1.0/odd_over
             imp_under = 1.0/odd_under
             s = imp_over + imp_under
@@ -47,12 +39,9 @@ def run(home, away, simulations=3000):
     else:
         final_over_2_5 = over_2_5
 
-    html = f"<h2>{home} 🆚 {away}</h2>"
-    html += "<p><b>⚽ Анализ: Брой голове (Over/Under)</b></p>"
-    html += f"<p>Over 0.5: {over_0_5*100:.1f}%</p>"
-    html += f"<p>Over 1.5: {over_1_5*100:.1f}%</p>"
-    html += f"<p>Over 2.5 (model): {over_2_5*100:.1f}%</p>"
-    html += f"<p>Over 2.5 (final): {final_over_2_5*100:.1f}%</p>"
-    html += f"<p>Over 3.5: {over_3_5*100:.1f}%</p>"
+    result['over_2.5_market'] = imp_p_over
+    result['over_2.5_final'] = float(final_over_2_5)
+    return result
 
-    return html
+def run(home, away, strength=None):
+    return render_goals(analyze(home, away, strength))
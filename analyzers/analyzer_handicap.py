@@ -1,43 +1,29 @@
-import numpy as np
-from analyzers.data import mean_home_goals, mean_away_goals, team_strength
-from scipy.stats import poisson
+from analyzers.data import current
+from analyzers.metrics import span
+from analyzers.render import render_handicap
+from analyzers.score_matrix import score_matrix, outcome_probs, asian_handicap_probs
 
-def run(home, away, simulations=3000):
-    # Симулация на мач и проверка за хендикап линии (-0.5, -1, +0.5 и т.н.)
-    ha, hd, _ = team_strength(home, True)
-    aa, ad, _ = team_strength(away, False)
+def analyze(home, away, strength=None):
+    # Матрица на резултатите и проверка за хендикап линии (-0.5, -1, +0.5 и т.н.)
+    league = current().league_for(home, away)
 
-    lambda_home = mean_home_goals * (ha / max(0.1, ad))
-    lambda_away = mean_away_goals * (aa / max(0.1, hd))
-    lambda_home = float(np.clip(lambda_home, 0.1, 5.0))
-    lambda_away = float(np.clip(lambda_away, 0.1, 5.0))
+    with span('lambda'):
+        lambda_home, lambda_away = league.match_lambdas(home, away, strength)
 
-    counts = {'home_win':0, 'draw':0, 'away_win':0,
-              'home_cover_-0.5':0, 'home_cover_-1':0, 'away_cover_+0.5':0 }
+    m = score_matrix(lambda_home, lambda_away)
+    home_win, draw, away_win = outcome_probs(m)
 
-    for _ in range(simulations):
-        gh = np.random.poisson(lambda_home)
-        ga = np.random.poisson(lambda_away)
-        if gh>ga: counts['home_win'] +=1
-        elif gh==ga: counts['draw'] +=1
-        else: counts['away_win'] +=1
+    # -0.5 (home needs strict lead)
+    cover_05, _, _ = asian_handicap_probs(m, -0.5)
+    # -1 (home needs win by >=2 for full cover; win by 1 is push in many lines)
+    cover_1, push_1, _ = asian_handicap_probs(m, -1)
+    # +0.5 away cover (away not lose) = home -0.5 loses
+    _, _, away_cover_05 = asian_handicap_probs(m, -0.5)
 
-        # -0.5 (home needs strict lead)
-        if gh - ga > 0:
-            counts['home_cover_-0.5'] +=1
-        # -1 (home needs win by >=2 for full cover; win by 1 is push in many lines)
-        if gh - ga >= 2:
-            counts['home_cover_-1'] +=1
-        # +0.5 away cover (away not lose)
-        if ga - gh >= 0:
-            counts['away_cover_+0.5'] +=1
+    return {'home': home, 'away': away, 'lambda_home': lambda_home, 'lambda_away': lambda_away,
+            'prob_home': float(home_win), 'prob_draw': float(draw), 'prob_away': float(away_win),
+            'ah_home_-0.5': float(cover_05), 'ah_home_-1': float(cover_1), 'ah_home_-1_push': float(push_1),
+            'ah_away_+0.5': float(away_cover_05)}
 
-    total = simulations
-    html = f"<h2>{home} 🆚 {away}</h2>"
-    html += "<p><b>📉 Анализ: Хендикап (симулация)</b></p>"
-    html += f"<p>Home win: {counts['home_win']/total*100:.1f}% | Draw: {counts['draw']/total*100:.1f}% | Away win: {counts['away_win']/total*100:.1f}%</p>"
-    html += f"<p>Home covers -0.5: {counts['home_cover_-0.5']/total*100:.1f}%</p>"
-    html += f"<p>Home covers -1 (win by 2+): {counts['home_cover_-1']/total*100:.1f}%</p>"
-    html += f"<p>Away not lose (+0.5): {counts['away_cover_+0.5']/total*100:.1f}%</p>"
-
-    return html
+def run(home, away, strength=None):
+    return render_handicap(analyze(home, away, strength))
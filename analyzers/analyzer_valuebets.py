@@ -1,6 +1,6 @@
-import pandas as pd
-import numpy as np
-from scipy.stats import poisson
+from analyzers.data import current
+from analyzers.render import render_valuebets
+from analyzers.score_matrix import score_matrix, outcome_probs
 
 # --- Вътрешни функции ---
 
@@ -23,16 +23,16 @@ def normalize_probs(probs):
 
 def find_value_bets(home, away, data, min_edge=0.05):
     """
-    Връща HTML с value bets за конкретен мач.
+    Value bets за конкретен мач: имплицитни и моделни вероятности, edge за
+    всеки изход и изходите с edge > min_edge ('home', 'draw', 'away').
     """
-    # Унифициран филтър: премахваме интервали и правим lowercase
-    df_match = data[
-        (data['HomeTeam'].str.strip().str.lower() == home.strip().lower()) &
-        (data['AwayTeam'].str.strip().str.lower() == away.strip().lower())
-    ]
+    # Имената се нормализират веднъж през регистъра; филтърът сравнява кодовете на категориите
+    registry = current().registry
+    home, away = registry.canonical(home), registry.canonical(away)
+    df_match = data[(data['HomeTeam'] == home) & (data['AwayTeam'] == away)]
 
     if df_match.empty:
-        return "<p>Няма налични данни за този мач.</p>"
+        return {'home': home, 'away': away, 'message': "Няма налични данни за този мач."}
 
     df_match = df_match.iloc[0]  # вземаме първия ред
 
@@ -49,55 +49,33 @@ def find_value_bets(home, away, data, min_edge=0.05):
     lambda_home = mean_home_goals * (df_match['FTHG'] / mean_home_goals if df_match['FTHG']>0 else 1)
     lambda_away = mean_away_goals * (df_match['FTAG'] / mean_away_goals if df_match['FTAG']>0 else 1)
 
-    simulations = 5000
-    home_wins = draws = away_wins = 0
-
-    for _ in range(simulations):
-        gh = np.random.poisson(lambda_home)
-        ga = np.random.poisson(lambda_away)
-        if gh > ga:
-            home_wins += 1
-        elif gh == ga:
-            draws += 1
-        else:
-            away_wins += 1
-
-    sim_prob_H = home_wins / simulations
-    sim_prob_D = draws / simulations
-    sim_prob_A = away_wins / simulations
+    sim_prob_H, sim_prob_D, sim_prob_A = (float(p) for p in outcome_probs(score_matrix(lambda_home, lambda_away)))
 
     # Изчисляване на Edge
     edge_H = sim_prob_H - prob_H
     edge_D = sim_prob_D - prob_D
     edge_A = sim_prob_A - prob_A
 
-    # --- HTML резултат ---
-    html = f"<h2>💰 Value Bets за мача: {home} 🆚 {away}</h2><ul>"
-
-    if edge_H > min_edge:
-        html += f"<li>🏠 Победа {home}: Value {edge_H*100:.1f}% " \
-                f"(реална {sim_prob_H*100:.1f}% vs импл. {prob_H*100:.1f}%)</li>"
-    if edge_D > min_edge:
-        html += f"<li>🤝 Равенство: Value {edge_D*100:.1f}% " \
-                f"(реална {sim_prob_D*100:.1f}% vs импл. {prob_D*100:.1f}%)</li>"
-    if edge_A > min_edge:
-        html += f"<li>🚀 Победа {away}: Value {edge_A*100:.1f}% " \
-                f"(реална {sim_prob_A*100:.1f}% vs импл. {prob_A*100:.1f}%)</li>"
-
-    if html.endswith("<ul>"):
-        html += "<li>Няма забележими value bets.</li>"
-
-    html += "</ul>"
-    return html
+    result = {'home': home, 'away': away, 'min_edge': min_edge,
+              'lambda_home': float(lambda_home), 'lambda_away': float(lambda_away)}
+    for outcome, implied, model, edge in (('home', prob_H, sim_prob_H, edge_H),
+                                          ('draw', prob_D, sim_prob_D, edge_D),
+                                          ('away', prob_A, sim_prob_A, edge_A)):
+        result.update({f'implied_{outcome}': float(implied), f'prob_{outcome}': model, f'edge_{outcome}': float(edge)})
+    result['value_bets'] = [o for o in ('home', 'draw', 'away') if result[f'edge_{o}'] > min_edge]
+    return result
 
 # --- Главна функция за Flask ---
-def predict_match(home, away, data=None):
+def analyze(home, away, data=None):
     if data is None:
-        return "<p>DataFrame с мачове не е подаден.</p>"
+        return {'home': home, 'away': away, 'message': "DataFrame с мачове не е подаден."}
     if home == away:
-        return "<p>Моля, избери два различни отбора.</p>"
+        return {'home': home, 'away': away, 'message': "Моля, избери два различни отбора."}
     return find_value_bets(home, away, data)
 
+def predict_match(home, away, data=None):
+    return render_valuebets(analyze(home, away, data))
+
 # --- Унифициран run() метод за всички анализатори ---
 def run(home, away, data=None):
     return predict_match(home, away, data)
@@ -0,0 +1,205 @@
+"""
+Бектест "към момента на мача": мачовете на всяка лига се обхождат хронологично и
+всяка прогноза ползва само резултатите отпреди началния час. Формата се води
+инкрементално в RatingStore (като live резултатите), без повторно филтриране.
+
+Стартиране от корена на проекта:
+    python -m analyzers.backtest                      # всички лиги
+    python -m analyzers.backtest --league E0 SP1 --from 2025-08-01 --edge 0.05
+    python -m analyzers.backtest --json
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+import pandas as pd
+from analyzers.data import current, expected_goals, relative_strength, RATING_WINDOW
+from analyzers.ratings import RatingStore
+from analyzers.score_matrix import score_matrix, outcome_probs
+
+# Пазарите, срещу които се смята ROI: (име, колони H/D/A)
+ODDS = {
+    'avg': ('AvgH', 'AvgD', 'AvgA'),
+    'closing': ('AvgCH', 'AvgCD', 'AvgCA'),
+}
+MIN_HISTORY = 3  # мачове на отбора на този терен, преди да прогнозираме
+
+
+def _has_history(ratings, team, min_history):
+    # нужни са мачове и у дома, и като гост (формата ползва и двата терена)
+    for is_home in (True, False):
+        state = ratings.forms.get((team, is_home))
+        if state is None or len(state[0]) < min_history:
+            return False
+    return True
+
+
+def walk_lambdas(league_data, window=RATING_WINDOW, min_history=MIN_HISTORY, start=None):
+    """
+    Обхожда мачовете на една лига по ред; мачовете с еднакъв начален час се
+    прогнозират преди който и да е от тях да влезе във формата.
+    Връща позициите на прогнозираните мачове и (λ домакин, λ гост) за тях.
+    """
+    ratings = RatingStore(window)
+    homes = league_data['HomeTeam'].astype(str).to_numpy()
+    aways = league_data['AwayTeam'].astype(str).to_numpy()
+    fthg = league_data['FTHG'].to_numpy(dtype=float)
+    ftag = league_data['FTAG'].to_numpy(dtype=float)
+    dates = league_data['Date'].to_numpy(dtype='datetime64[ns]')
+    start = np.datetime64(pd.Timestamp(start), 'ns') if start is not None else None
+
+    rows, lambdas = [], []
+    i, n = 0, len(league_data)
+    while i < n:
+        j = i + 1
+        while j < n and dates[j] == dates[i]:
+            j += 1
+        mean_home, mean_away = ratings.mean('FTHG'), ratings.mean('FTAG')
+        for k in range(i, j):
+            if np.isnan(fthg[k]) or np.isnan(ftag[k]):
+                continue
+            if start is not None and not dates[k] >= start:
+                continue
+            home, away = homes[k], aways[k]
+            if not (_has_history(ratings, home, min_history) and _has_history(ratings, away, min_history)):
+                continue
+            # същата сила като Snapshot.team_strength: форма / средни на лигата към момента
+            ha, hd, _ = relative_strength(ratings.scored(home, True), ratings.scored(home, False),
+                                          True, mean_home, mean_away)
+            aa, ad, _ = relative_strength(ratings.scored(away, False), ratings.scored(away, True),
+                                          False, mean_home, mean_away)
+            rows.append(k)
+            lambdas.append(expected_goals(mean_home, mean_away, ha, hd, aa, ad))
+        played = [(homes[k], aways[k], fthg[k], ftag[k], None)
+                  for k in range(i, j) if not (np.isnan(fthg[k]) or np.isnan(ftag[k]))]
+        ratings = ratings.with_results(played)
+        i = j
+    return np.array(rows, dtype=np.intp), np.array(lambdas, dtype=float).reshape(-1, 2)
+
+
+def _scores(probs, outcome):
+    # log-loss и Brier (за трите изхода) - по един на мач
+    p = np.clip(probs[np.arange(len(outcome)), outcome], 1e-15, 1.0)
+    onehot = np.eye(3)[outcome]
+    return -np.log(p), ((probs - onehot) ** 2).sum(axis=1)
+
+
+def _roi(probs, odds, outcome, edge):
+    # залог 1 единица на всеки изход с очаквана стойност p*odds - 1 > edge
+    valid = np.isfinite(odds) & (odds > 1.0)
+    bets = valid & (probs * np.where(valid, odds, 0.0) - 1.0 > edge)
+    won = bets & (np.arange(3)[None, :] == outcome[:, None])
+    staked = int(bets.sum())
+    profit = float((np.where(won, odds - 1.0, 0.0) - (bets & ~won)).sum())
+    return {'bets': staked, 'profit': profit, 'roi': profit / staked if staked else None}
+
+
+def _implied(odds):
+    # нормализирани имплицитни вероятности на пазара (без марж)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = 1.0 / odds
+        return inv / inv.sum(axis=1, keepdims=True)
+
+
+def _summary(frame, probs, edge):
+    outcome = frame['outcome'].to_numpy()
+    if len(outcome) == 0:
+        return {'matches': 0}
+    log_loss, brier = _scores(probs, outcome)
+    result = {'matches': int(len(outcome)), 'log_loss': float(log_loss.mean()), 'brier': float(brier.mean())}
+    for name, cols in ODDS.items():
+        odds = frame[list(cols)].to_numpy(dtype=float)
+        market = _implied(odds)
+        priced = np.isfinite(market).all(axis=1)
+        result[name] = dict(_roi(probs, odds, outcome, edge), matches=int(priced.sum()),
+                            market_log_loss=None, market_brier=None, model_log_loss=None)
+        if priced.any():
+            # на същите мачове: модел срещу пазара
+            market_log_loss, market_brier = _scores(market[priced], outcome[priced])
+            result[name].update(market_log_loss=float(market_log_loss.mean()),
+                                market_brier=float(market_brier.mean()),
+                                model_log_loss=float(log_loss[priced].mean()))
+    return result
+
+
+def backtest(leagues=None, start=None, edge=0.0, window=RATING_WINDOW, min_history=MIN_HISTORY):
+    """
+    Бектест на модела 1X2 по лиги. Връща {'leagues': {лига: метрики}, 'total': метрики,
+    'predictions': DataFrame, 'elapsed_s': ...}; метриките са log-loss, Brier и ROI
+    срещу средните (AvgH/D/A) и затварящите (AvgCH/D/A) коефициенти.
+    """
+    began = time.perf_counter()
+    snapshot = current()
+    names = leagues or sorted(snapshot.leagues)
+    frames = []
+    for name in names:
+        data = snapshot.leagues[name].data
+        rows, lambdas = walk_lambdas(data, window, min_history, start)
+        frame = data.iloc[rows][['Div', 'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG']].copy()
+        for cols in ODDS.values():
+            for col in cols:
+                frame[col] = data[col].iloc[rows].to_numpy(dtype=float) if col in data else np.nan
+        frame['lambda_home'], frame['lambda_away'] = lambdas.T if len(rows) else ([], [])
+        frames.append(frame)
+
+    predictions = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if len(predictions):
+        # всички прогнози наведнъж - една матрица на резултатите на мач
+        m = score_matrix(predictions['lambda_home'].to_numpy(), predictions['lambda_away'].to_numpy())
+        probs = np.stack(outcome_probs(m), axis=1)
+        predictions['prob_home'], predictions['prob_draw'], predictions['prob_away'] = probs.T
+        predictions['outcome'] = np.select([predictions['FTHG'] > predictions['FTAG'],
+                                            predictions['FTHG'] == predictions['FTAG']], [0, 1], 2)
+    else:
+        probs = np.empty((0, 3))
+
+    per_league = {}
+    for name in names:
+        mask = (predictions['Div'].astype(str) == name).to_numpy() if len(predictions) else np.zeros(0, dtype=bool)
+        per_league[name] = _summary(predictions[mask], probs[mask], edge)
+    return {
+        'leagues': per_league,
+        'total': _summary(predictions, probs, edge) if len(predictions) else {'matches': 0},
+        'predictions': predictions,
+        'elapsed_s': time.perf_counter() - began,
+    }
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бектест на 1X2 модела върху историческите мачове")
+    parser.add_argument('--league', nargs='+', help="само тези лиги (Div)")
+    parser.add_argument('--from', dest='start', help="само мачове от тази дата (формата се трупа и преди нея)")
+    parser.add_argument('--edge', type=float, default=0.0, help="минимална очаквана стойност за залог")
+    parser.add_argument('--window', type=int, default=RATING_WINDOW)
+    parser.add_argument('--json', action='store_true', help="резултатът като JSON")
+    args = parser.parse_args(argv)
+    known = current().leagues
+    unknown = [name for name in args.league or () if name not in known]
+    if unknown:
+        parser.error(f"непознати лиги: {', '.join(unknown)} (възможни: {', '.join(sorted(known))})")
+
+    result = backtest(args.league, args.start, args.edge, args.window)
+    if args.json:
+        json.dump({k: v for k, v in result.items() if k != 'predictions'}, sys.stdout, indent=1, ensure_ascii=False)
+        print()
+        return
+
+    print(f"{'лига':<18}{'мачове':>8}{'log-loss':>10}{'пазар':>8}{'Brier':>8}"
+          f"{'залози':>8}{'ROI avg':>9}{'залози':>8}{'ROI закр.':>10}")
+    for name, s in list(result['leagues'].items()) + [('ОБЩО', result['total'])]:
+        if not s['matches']:
+            continue
+        avg, closing = s['avg'], s['closing']
+        print(f"{name:<18}{s['matches']:>8}{s['log_loss']:>10.4f}{_fmt(closing['market_log_loss'], '.4f'):>8}"
+              f"{s['brier']:>8.4f}{avg['bets']:>8}{_fmt(avg['roi'], '+.1%'):>9}"
+              f"{closing['bets']:>8}{_fmt(closing['roi'], '+.1%'):>10}")
+    print(f"време: {result['elapsed_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import numpy as np
+from analyzers.data import current, expected_goals, LAMBDA_BOUNDS
+from analyzers.dixon_coles import model as dixon_coles_model
+from analyzers.metrics import span
+from analyzers.score_matrix import (score_matrix, dixon_coles_matrix, outcome_probs, over_probs, btts_prob,
+                                    asian_handicap_probs)
+
+MODELS = ('form', 'dixon_coles')
+
+OVER_LINES = (0.5, 1.5, 2.5, 3.5)
+HANDICAP_LINES = (-1.5, -1, -0.5, 0.5)
+
+
+def _fixture_teams(fixture):
+    if isinstance(fixture, dict):
+        return fixture.get('home'), fixture.get('away')
+    home, away = fixture
+    return home, away
+
+
+def fixture_lambdas(fixtures):
+    """
+    Очаквани голове (λ домакин, λ гост) за списък мачове като масиви с форма (N,).
+    Всеки мач се оценява спрямо средните на своята лига.
+    """
+    snapshot = current()
+    rows = []
+    for home, away in map(_fixture_teams, fixtures):
+        league = snapshot.league_for(home, away)
+        rows.append(league.match_strength(home, away) + (league.mean_home_goals, league.mean_away_goals))
+    home_attack, home_defense, away_attack, away_defense, mean_home, mean_away = \
+        np.array(rows, dtype=float).reshape(-1, 6).T
+
+    with span('lambda'):
+        return expected_goals(mean_home, mean_away, home_attack, home_defense, away_attack, away_defense)
+
+
+def dixon_coles_params(fixtures):
+    """
+    (λ домакин, λ гост, ρ) от фитнатия Dixon–Coles модел - lookup по лигата на мача;
+    за лига без fit остават λ от формата и ρ = 0.
+    """
+    snapshot, dc = current(), dixon_coles_model()
+    lambda_home, lambda_away = fixture_lambdas(fixtures)
+    rho = np.zeros(len(lambda_home))
+    with span('lambda'):
+        for i, (home, away) in enumerate(map(_fixture_teams, fixtures)):
+            params = dc.params(snapshot.league_for(home, away).name, home, away)
+            if params is not None:
+                lambda_home[i], lambda_away[i], rho[i] = params
+    return np.clip(lambda_home, *LAMBDA_BOUNDS), np.clip(lambda_away, *LAMBDA_BOUNDS), rho
+
+
+def predict_batch(fixtures, over_lines=OVER_LINES, handicap_lines=HANDICAP_LINES, model='form'):
+    """
+    Всички пазари за списък мачове наведнъж. `fixtures` е списък от (home, away)
+    или {'home': ..., 'away': ...}; всяка стойност в резултата е масив с форма (N,).
+    model='dixon_coles' взима λ и ρ от фитнатия модел вместо от формата.
+    """
+    if model == 'dixon_coles':
+        lambda_home, lambda_away, rho = dixon_coles_params(fixtures)
+        m = dixon_coles_matrix(lambda_home, lambda_away, rho)
+    else:
+        lambda_home, lambda_away = fixture_lambdas(fixtures)
+        m = score_matrix(lambda_home, lambda_away)
+
+    prob_home, prob_draw, prob_away = outcome_probs(m)
+    flat = m.reshape(len(m), m.shape[1] * m.shape[2])
+    flat_best = flat.argmax(axis=1)
+    best_home, best_away = np.unravel_index(flat_best, m.shape[1:])
+
+    result = {
+        'lambda_home': lambda_home,
+        'lambda_away': lambda_away,
+        'prob_home': prob_home,
+        'prob_draw': prob_draw,
+        'prob_away': prob_away,
+        'btts': btts_prob(m),
+        'score_home': best_home,
+        'score_away': best_away,
+        'score_prob': flat[np.arange(len(m)), flat_best],
+    }
+    for line, probs in over_probs(m, over_lines).items():
+        result[f'over_{line}'] = probs
+    for line in handicap_lines:
+        win, push, _ = asian_handicap_probs(m, line)
+        result[f'ah_home_{line:+g}'] = win
+        result[f'ah_home_{line:+g}_push'] = push
+    return result
+
+
+def batch_records(fixtures, result):
+    """
+    Превръща масивите от predict_batch в списък речници (за JSON); NaN -> None.
+    """
+    records = []
+    for i, fixture in enumerate(fixtures):
+        home, away = _fixture_teams(fixture)
+        record = {'home': home, 'away': away}
+        for key, values in result.items():
+            value = values[i].item()
+            record[key] = None if isinstance(value, float) and np.isnan(value) else value
+        records.append(record)
+    return records
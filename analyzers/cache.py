@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Колонков кеш на CSV файловете в data/.cache/:
+#   <name>.json         - манифест: mtime/size/sha1 на всеки CSV
+#   <name>/<file>.npz   - снимка на един валиден CSV (по един масив на колона)
+#   <name>.npz          - снимка на целия обединен DataFrame
+# Ако нито един файл не е променен (по sha1 на съдържанието), се чете само
+# обединената снимка - без парсване и без обединяване (combine, напр. премахване
+# на дубликати); иначе се парсват наново само променените файлове.
+CACHE_VERSION = 1
+
+
+def _signature(path):
+    st = os.stat(path)
+    return {'mtime': st.st_mtime_ns, 'size': st.st_size}
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_frame(df, path):
+    """
+    Записва DataFrame като .npz: числовите колони като са, текстовите като
+    unicode масив + маска за липсващи, категориите като кодове + категории.
+    Смесените колони (напр. коефициенти с '`' в Conference.csv) пазят отделно
+    текстовите и числовите стойности, за да се възстановят със същите типове.
+    """
+    arrays = {'__columns__': np.array([str(c) for c in df.columns])}
+    kinds = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            arrays[f'c{i}'] = s.cat.codes.to_numpy()
+            arrays[f'k{i}'] = s.cat.categories.to_numpy(dtype=str)
+            kinds.append('category')
+        elif s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ('string', 'empty'):
+            is_str = s.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+            numeric = pd.to_numeric(s.where(~is_str), errors='coerce')
+            arrays[f'c{i}'] = s.where(is_str, '').astype(str).to_numpy(dtype=str)
+            arrays[f'f{i}'] = numeric.to_numpy(dtype=float)
+            arrays[f'n{i}'] = np.where(is_str, 1, np.where(numeric.notna(), 2, 0)).astype(np.int8)
+            kinds.append('mixed')
+        elif s.dtype == object:
+            missing = s.isna().to_numpy()
+            arrays[f'c{i}'] = s.where(~missing, '').astype(str).to_numpy(dtype=str)
+            arrays[f'n{i}'] = missing
+            kinds.append('object')
+        else:
+            arrays[f'c{i}'] = s.to_numpy()
+            kinds.append('plain')
+    arrays['__kinds__'] = np.array(kinds)
+
+    # запис във временен файл + os.replace, за да не се чете наполовина записан кеш
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_frame(path):
+    with np.load(path, allow_pickle=False) as z:
+        names = list(z['__columns__'])
+        kinds = list(z['__kinds__'])
+        columns = {}
+        for i, (name, kind) in enumerate(zip(names, kinds)):
+            values = z[f'c{i}']
+            if kind == 'category':
+                columns[name] = pd.Categorical.from_codes(values, categories=z[f'k{i}'])
+            elif kind == 'object':
+                col = values.astype(object)
+                col[z[f'n{i}']] = np.nan
+                columns[name] = col
+            elif kind == 'mixed':
+                tags = z[f'n{i}']
+                col = np.full(len(values), np.nan, dtype=object)
+                col[tags == 1] = values[tags == 1]
+                col[tags == 2] = z[f'f{i}'][tags == 2]
+                columns[name] = col
+            else:
+                columns[name] = values
+    return pd.DataFrame(columns, columns=names)
+
+
+def _read_manifest(path, key):
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+    if manifest.get('version') != CACHE_VERSION or manifest.get('key') != key:
+        return {'files': {}}
+    return manifest
+
+
+def _write_manifest(path, manifest):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _concat(frames):
+    return pd.concat(frames, ignore_index=True), None
+
+
+def _load_cached(csv_files, read, name, key, combine):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_files[0])), '.cache')
+    manifest_path = os.path.join(cache_dir, f'{name}.json')
+    combined_path = os.path.join(cache_dir, f'{name}.npz')
+    manifest = _read_manifest(manifest_path, key)
+
+    files = {}
+    fresh = {}
+    dirty = False
+    for path in csv_files:
+        fname = os.path.basename(path)
+        sig = _signature(path)
+        entry = manifest['files'].get(fname)
+        if entry and entry['mtime'] == sig['mtime'] and entry['size'] == sig['size']:
+            files[fname] = entry
+            continue
+
+        # mtime/size са различни - проверяваме съдържанието преди да парсваме
+        digest = file_hash(path)
+        if entry and entry['sha1'] == digest:
+            files[fname] = dict(entry, **sig)
+            dirty = True
+            continue
+
+        df = read(path)
+        files[fname] = dict(sig, sha1=digest, valid=df is not None)
+        if df is not None:
+            save_frame(df, os.path.join(cache_dir, name, fname + '.npz'))
+            fresh[fname] = df
+        dirty = True
+
+    order = [[os.path.basename(p), files[os.path.basename(p)]['sha1']] for p in csv_files]
+    if not fresh and manifest.get('combined') == order and os.path.exists(combined_path):
+        if dirty:
+            _write_manifest(manifest_path, dict(manifest, files=files))
+        data = load_frame(combined_path)
+        data.attrs['combine'] = manifest.get('info')
+        return data
+
+    frames = []
+    for path in csv_files:
+        fname = os.path.basename(path)
+        if not files[fname]['valid']:
+            continue
+        if fname in fresh:
+            frames.append(fresh[fname])
+        else:
+            frames.append(load_frame(os.path.join(cache_dir, name, fname + '.npz')))
+    if not frames:
+        return None
+
+    data, info = combine(frames)
+    save_frame(data, combined_path)
+    _write_manifest(manifest_path, {'version': CACHE_VERSION, 'key': key, 'files': files,
+                                    'combined': order, 'info': info})
+    data.attrs['combine'] = info
+    return data
+
+
+def load_csv_cached(csv_files, read, name='data', key='', combine=None):
+    """
+    Зарежда и обединява CSV файловете през колонковия кеш.
+    `read(path)` парсва един файл и връща DataFrame или None (невалиден файл);
+    `key` описва настройките на read - при промяна кешът се изгражда наново.
+    `combine(frames)` обединява прочетените файлове и връща (DataFrame, info);
+    info (JSON) се пази в манифеста и се връща в data.attrs['combine'].
+    Връща обединения DataFrame или None, ако няма валидни файлове.
+    """
+    if not csv_files:
+        return None
+    combine = combine or _concat
+    try:
+        return _load_cached(csv_files, read, name, key, combine)
+    except (OSError, ValueError, KeyError):
+        # кешът е недостъпен/повреден - четем директно
+        frames = [df for df in (read(path) for path in csv_files) if df is not None]
+        if not frames:
+            return None
+        data, info = combine(frames)
+        data.attrs['combine'] = info
+        return data
+
+
+# --- Масиви за споделяне между процеси: един файл, четен през np.memmap ---
+# Формат: MAGIC, дължина на JSON заглавието (8 байта), заглавието (meta + къде е
+# всеки масив), после данните, подравнени на ARRAY_ALIGN байта. Файлът се
+# заменя с os.replace - процесите, които вече са го отворили, четат стария докрай.
+MAGIC = b'FASTORE1'
+ARRAY_ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // ARRAY_ALIGN) * ARRAY_ALIGN
+
+
+def save_arrays(arrays, meta, path):
+    """
+    Записва речник име -> numpy масив (без object колони) и JSON `meta` в един
+    файл, който map_arrays() отваря без копиране.
+    """
+    arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        if values.dtype.hasobject:
+            raise ValueError(f"масивът {name} е от тип object")
+        offset = _aligned(offset)
+        layout[name] = [values.dtype.str, list(values.shape), offset]
+        offset += values.nbytes
+    header = json.dumps({'meta': meta, 'arrays': layout}, ensure_ascii=False).encode('utf-8')
+    start = _aligned(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+        for name, values in arrays.items():
+            f.seek(start + layout[name][2])
+            f.write(values.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def read_meta(path):
+    # само JSON заглавието (meta, разположение) - без да се отварят масивите
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} не е файл с масиви")
+        size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(size).decode('utf-8'))
+    return header, _aligned(len(MAGIC) + 8 + size)
+
+
+def map_arrays(path):
+    """
+    Отваря файла от save_arrays() read-only през np.memmap. Връща (meta, масиви);
+    масивите са изгледи към страниците на файла, които ОС споделя между всички
+    процеси, отворили същия файл.
+    """
+    header, start = read_meta(path)
+    mapped = np.memmap(path, mode='r')
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        arrays[name] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=mapped, offset=start + offset)
+    return header['meta'], arrays
@@ -0,0 +1,45 @@
+import numpy as np
+from analyzers.ratings import recency_weights
+
+# Броячи за пазарите корнери и картони: (домакин, гост) по статистика
+COUNT_COLUMNS = ('HC', 'AC', 'HY', 'AY', 'HF', 'AF')
+
+
+def team_rates(data, team_index, last_matches=10, teams=None):
+    """
+    (отбор, is_home) -> масив с претеглените средни на COUNT_COLUMNS в последните
+    `last_matches` мача на отбора на този терен (празните стойности се броят за 0,
+    както в weighted_avg; липсваща колона -> NaN). Всички отбори наведнъж.
+    """
+    columns = [c for c in COUNT_COLUMNS if c in data.columns]
+    keys, tails = [], []
+    for team in (team_index if teams is None else teams):
+        for is_home, rows in zip((True, False), team_index[team]):
+            if len(rows):
+                keys.append((team, is_home))
+                tails.append(rows[-last_matches:])
+    if not keys:
+        return {}
+
+    # позициите в матрица (отбор x мач), подравнени вдясно; празните клетки са с тежест 0
+    index = np.zeros((len(tails), last_matches), dtype=np.intp)
+    weights = np.zeros((len(tails), last_matches))
+    for i, rows in enumerate(tails):
+        index[i, last_matches - len(rows):] = rows
+        w = recency_weights(len(rows))
+        weights[i, last_matches - len(rows):] = w / w.sum()
+    values = data[columns].fillna(0).to_numpy(dtype=float)
+    rates = np.full((len(keys), len(COUNT_COLUMNS)), np.nan)
+    rates[:, [COUNT_COLUMNS.index(c) for c in columns]] = np.einsum('tk,tkc->tc', weights, values[index])
+    return dict(zip(keys, rates))
+
+
+def over_probs(means, thresholds):
+    """
+    P(брой > линия) за всяко очакване в `means` (N,) и всяка линия в `thresholds` (K,)
+    -> масив (N, K). Точни Poisson опашки.
+    """
+    from scipy.special import pdtrc  # scipy се зарежда при първия пазар, не при import
+    means = np.atleast_1d(np.asarray(means, dtype=float))[:, None]
+    k = np.floor(np.asarray(thresholds, dtype=float))[None, :]
+    return pdtrc(k, means)
@@ -1,55 +1,954 @@
+import functools
 import glob
+import hashlib
+import os
+import sys
+import threading
+import time
 import pandas as pd
 import numpy as np
+from analyzers.cache import load_csv_cached, map_arrays, read_meta, save_arrays
+from analyzers.counts import COUNT_COLUMNS, team_rates
+from analyzers.h2h import H2H_WINDOW, H2HIndex, match_days
+from analyzers.ratings import RatingStore, recency_weights
+from analyzers.teams import TeamRegistry, TeamSearch
+from analyzers.metrics import span
 
 # Зареждане на CSV файлове
-csv_files = glob.glob("data/*.csv")
-if len(csv_files) == 0:
-    csv_files = glob.glob("../data/*.csv")
+def csv_files():
+    files = glob.glob("data/*.csv")
+    if len(files) == 0:
+        files = glob.glob("../data/*.csv")
+    return sorted(files)
 
-dfs = []
-for file in csv_files:
+# --- Колони, които анализаторите реално четат (останалите ~100 букмейкърски не се зареждат) ---
+KEY_COLUMNS = ['Div', 'League', 'Date', 'Time', 'HomeTeam', 'AwayTeam']
+GOAL_COLUMNS = ['FTHG', 'FTAG']
+ANALYZER_COLUMNS = {
+    '1x2': GOAL_COLUMNS,
+    'btts': GOAL_COLUMNS,
+    'handicap': GOAL_COLUMNS,
+    'goals': GOAL_COLUMNS + ['Avg>2.5', 'Avg<2.5'],
+    'corners': ['HC', 'AC'],
+    'cards': ['HY', 'AY', 'HF', 'AF'],
+    'valuebets': GOAL_COLUMNS + ['AvgH', 'AvgD', 'AvgA'],
+    'backtest': GOAL_COLUMNS + ['AvgH', 'AvgD', 'AvgA', 'AvgCH', 'AvgCD', 'AvgCA'],
+    # 1X2 коефициенти на всички букмейкъри за скенера (B365, Pinnacle, Max, Avg + затварящите)
+    'scanner': [f'{book}{outcome}' for book in ('B365', 'PS', 'Max', 'Avg', 'B365C', 'PSC', 'MaxC', 'AvgC')
+                for outcome in 'HDA'],
+}
+
+def needed_columns():
+    columns = list(KEY_COLUMNS)
+    for cols in ANALYZER_COLUMNS.values():
+        columns += [c for c in cols if c not in columns]
+    return columns
+
+def _compact(df):
+    # голове -> int8 (float32, ако има празни), коефициенти/броячи -> float32
+    for col in df.columns:
+        if col in KEY_COLUMNS:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        if col in GOAL_COLUMNS and values.notna().all():
+            df[col] = values.astype(np.int8)
+        else:
+            df[col] = values.astype(np.float32)
+    return df
+
+def _league_names(df, file):
+    # Лигата на всеки ред: Div, а за файлове без Div (IRL.csv) - League без крайните интервали
+    if 'Div' in df.columns:
+        return df['Div'].astype(str).str.strip()
+    if 'League' in df.columns:
+        return df['League'].astype(str).str.strip()
+    return os.path.splitext(os.path.basename(file))[0]
+
+def _parse_kickoff(df):
+    # Date (dd/mm/yyyy, рядко dd/mm/yy) + Time -> datetime64; парсва се веднъж при зареждане
+    if 'Date' not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    date = df['Date'].astype(str).str.strip()
+    time_ = df['Time'].fillna('00:00').astype(str).str.strip() if 'Time' in df.columns else '00:00'
+    kickoff = pd.to_datetime(date + ' ' + time_, format='%d/%m/%Y %H:%M', errors='coerce')
+    missing = kickoff.isna() & df['Date'].notna()
+    if missing.any():
+        kickoff[missing] = pd.to_datetime(date[missing], dayfirst=True, format='mixed', errors='coerce')
+    return kickoff.astype('datetime64[ns]')
+
+def _read_csv(file):
     try:
-        df = pd.read_csv(file, dayfirst=True, encoding='utf-8')
+        columns = set(needed_columns())
+        df = pd.read_csv(file, dayfirst=True, encoding='utf-8', usecols=lambda c: c in columns)
         required_cols = ['HomeTeam', 'AwayTeam', 'FTHG', 'FTAG']
         if all(col in df.columns for col in required_cols):
-            dfs.append(df)
+            df = _compact(df)
+            df['Date'] = _parse_kickoff(df)  # дата + час на мача
+            df = df.drop(columns='Time', errors='ignore')
+            df['Div'] = _league_names(df, file)
+            df['File'] = os.path.basename(file)  # от кой файл е редът (за инкременталното презареждане)
+            return df
     except:
         pass
+    return None
 
-if len(dfs) == 0:
-    raise Exception("❌ Няма валидни CSV файлове в data/ !")
-
-data = pd.concat(dfs, ignore_index=True)
+# Ключът сменя кеша при промяна на набора колони (или на производните Div/File)
+_CACHE_KEY = ','.join(needed_columns() + ['File']) + ';div;kickoff;dedup'
 
-# Отбори
-teams = sorted(set(data['HomeTeam']).union(data['AwayTeam']))
+def _fingerprint(states):
+    # Отпечатък на заредения корпус (име, mtime, размер на всеки файл + набора колони)
+    h = hashlib.sha1(_CACHE_KEY.encode('utf-8'))
+    for file, (mtime, size) in sorted(states.items()):
+        h.update(f"{os.path.basename(file)}:{mtime}:{size};".encode('utf-8'))
+    return h.hexdigest()[:16]
 
-# Средни голове
-mean_home_goals = data['FTHG'].mean()
-mean_away_goals = data['FTAG'].mean()
+def _file_states(files):
+    states = {}
+    for file in files:
+        st = os.stat(file)
+        states[file] = (st.st_mtime_ns, st.st_size)
+    return states
 
 def weighted_avg(df, col, last_matches=10):
     df_tail = df.tail(last_matches)
     if len(df_tail) == 0 or col not in df_tail.columns:
         return np.nan
-    weights = np.exp(np.linspace(-1, 0, len(df_tail)))
-    return np.average(df_tail[col].fillna(0), weights=weights)
+    return np.average(df_tail[col].fillna(0), weights=recency_weights(len(df_tail)))
+
+def _weighted_tail(values, rows, last_matches):
+    # Същото като weighted_avg, но върху предварително намерените позиции
+    rows = rows[-last_matches:]
+    if len(rows) == 0:
+        return np.nan
+    return np.average(values[rows], weights=recency_weights(len(rows)))
+
+# --- Дубликати: едни и същи мачове в E0.csv/EPL.csv, E1.csv/Championship.csv и т.н. ---
+def _dedup_key(data):
+    # ден на мача, отбори, резултат
+    return pd.DataFrame({'day': data['Date'].dt.normalize(),
+                         'home': data['HomeTeam'].astype(str), 'away': data['AwayTeam'].astype(str),
+                         'fthg': data['FTHG'].astype(float), 'ftag': data['FTAG'].astype(float)})
+
+def _merge_report(pairs, report=()):
+    # (оставен файл, премахнат файл) -> брой мачове; добавя към съществуващ отчет
+    counts = {}
+    for item in report:
+        pair = (item['kept'], item['dropped'])
+        counts[pair] = counts.get(pair, 0) + item['matches']
+    for pair in pairs:
+        counts[pair] = counts.get(pair, 0) + 1
+    return [{'kept': kept, 'dropped': dropped, 'matches': n} for (kept, dropped), n in sorted(counts.items())]
+
+def deduplicate(data):
+    """
+    Премахва повторените мачове по (ден, домакин, гост, резултат); мачове без дата
+    не се обединяват. Остава редът с най-много попълнени колони, а при равенство -
+    от файла, кръстен на лигата (E0.csv пред EPL.csv). Връща (data, отчет).
+    """
+    key = _dedup_key(data)
+    filled = data.notna().sum(axis=1).to_numpy()
+    canonical = (data['File'].astype(str).str.rsplit('.', n=1).str[0] == data['Div'].astype(str)).to_numpy()
+    order = np.lexsort((np.arange(len(data)), ~canonical, -filled))
+    ranked = key.iloc[order]
+    dup = ranked.duplicated(keep='first').to_numpy() & ranked['day'].notna().to_numpy()
+    if not dup.any():
+        return data, []
+
+    # за всеки премахнат ред - файлът на реда, който е останал
+    group = ranked.groupby(list(key.columns), sort=False, dropna=False).ngroup().to_numpy()
+    first = pd.Series(order).groupby(group).transform('first').to_numpy()
+    files = data['File'].astype(str).to_numpy()
+    report = _merge_report(list(zip(files[first[dup]], files[order[dup]])))
+    return data.iloc[np.sort(order[~dup])].reset_index(drop=True), report
+
+def _combine(frames):
+    # обединяване при зареждане: кешира се заедно с отчета, така че при непроменени
+    # файлове (същия sha1) проверката за дубликати не се пуска отново
+    return deduplicate(pd.concat(frames, ignore_index=True))
+
+def _drop_loaded(snapshot, rows):
+    # нови редове при refresh: без мачовете, които вече са заредени от друг файл
+    rows, report = deduplicate(rows)
+    leagues = [snapshot.leagues[name] for name in rows['Div'].astype(str).unique() if name in snapshot.leagues]
+    if not leagues:
+        return rows, report
+    loaded = pd.concat([league.data for league in leagues], ignore_index=True)
+    known = dict(zip(_dedup_key(loaded).itertuples(index=False, name=None), loaded['File'].astype(str)))
+    keys = list(_dedup_key(rows).itertuples(index=False, name=None))
+    kept = [known.get(k) if not pd.isna(k[0]) else None for k in keys]
+    dup = np.array([file is not None for file in kept], dtype=bool)
+    pairs = [(file, dropped) for file, dropped in zip(kept, rows['File'].astype(str)) if file is not None]
+    return rows[~dup].reset_index(drop=True), _merge_report(pairs, report)
+
+def _column_totals(df):
+    # (сума, брой) за средните на лигата - събират се при добавяне на нови редове
+    totals = {col: (float(df[col].sum()), int(df[col].notna().sum())) for col in GOAL_COLUMNS}
+    # по колона (HC, AY, HF, ...) - базата на лигата за отбори без мачове
+    columns = [col for col in COUNT_COLUMNS if col in df.columns]
+    sums, counts = df[columns].sum(), df[columns].notna().sum()
+    for col in COUNT_COLUMNS:
+        totals[col] = (float(sums[col]), int(counts[col])) if col in columns else (0.0, 0)
+    return totals
+
+def _mean(total):
+    value, count = total
+    return value / count if count else np.nan
+
+# Рейтингите се пазят като сурова форма (претеглени вкарани/допуснати) в RatingStore
+# и се делят на средните за лигата при четене - така нов резултат променя само двата отбора
+RATING_WINDOW = 10
+_no_rows = np.empty(0, dtype=np.intp)
+
+
+class League:
+    """
+    Дял от снимката за една лига (Div): нейните мачове (подредени по дата и час),
+    средни, индекс по отбори и форма. Заявка за мач работи само с дяла на своята лига.
+    """
+
+    def __init__(self, name, data, totals, goals, team_index, ratings, count_rates=None):
+        self.name = name
+        self.data = data
+        self.totals = totals
+        self.goals = goals
+        self.team_index = team_index
+        self.ratings = ratings
+        # индекс по дата: сортиран datetime64 масив (NaT накрая) за двоично търсене
+        self.dates = data['Date'].to_numpy(dtype='datetime64[ns]')
+        self.teams = sorted(team_index)
+        self.mean_home_goals = ratings.mean('FTHG')
+        self.mean_away_goals = ratings.mean('FTAG')
+        # корнери/картони/фалове: средни на лигата по колона и претеглени средни на всеки отбор и терен
+        self.count_means = {col: _mean(totals[col]) for col in COUNT_COLUMNS}
+        self.count_rates = count_rates if count_rates is not None else team_rates(data, team_index, RATING_WINDOW)
+
+    def cutoff(self, as_of):
+        """
+        Брой мачове преди `as_of` (позиция в data) - двоично търсене в индекса по дата.
+        """
+        if as_of is None:
+            return len(self.dates)
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(as_of), 'ns'), side='left'))
+
+    def matches(self, start=None, end=None):
+        # мачовете в [start, end) като изглед от data
+        first = 0 if start is None else self.cutoff(start)
+        return self.data.iloc[first:self.cutoff(end)]
+
+    def _form(self, team, is_home, last_matches, cut=None):
+        home_rows, away_rows = self.team_index[team]
+        if cut is not None:
+            # позициите на отбора са възходящи, както и датите -> отрязваме с двоично търсене
+            home_rows = home_rows[:np.searchsorted(home_rows, cut)]
+            away_rows = away_rows[:np.searchsorted(away_rows, cut)]
+        if is_home:
+            goals_for = _weighted_tail(self.goals['FTHG'], home_rows, last_matches)
+            goals_against = _weighted_tail(self.goals['FTAG'], away_rows, last_matches)
+        else:
+            goals_for = _weighted_tail(self.goals['FTAG'], away_rows, last_matches)
+            goals_against = _weighted_tail(self.goals['FTHG'], home_rows, last_matches)
+        return goals_for, goals_against
+
+    def team_strength(self, team, is_home, last_matches=10, as_of=None):
+        """
+        (атака, защита, nan) на отбора спрямо средните на лигата; с `as_of` -
+        само от мачовете преди тази дата (и средните към нея).
+        """
+        with span('team_strength'):
+            if as_of is not None:
+                return self._strength_as_of(team, is_home, last_matches, self.cutoff(as_of))
+            return self._strength(team, is_home, last_matches)
+
+    def _strength_as_of(self, team, is_home, last_matches, cut):
+        if team not in self.team_index or cut == 0:
+            return 1.0, 1.0, np.nan
+        goals_for, goals_against = self._form(team, is_home, last_matches, cut)
+        mean_home_goals = self.goals['FTHG'][:cut].mean()
+        mean_away_goals = self.goals['FTAG'][:cut].mean()
+        return relative_strength(goals_for, goals_against, is_home, mean_home_goals, mean_away_goals)
+
+    def _strength(self, team, is_home, last_matches):
+        if last_matches == RATING_WINDOW:
+            if (team, True) not in self.ratings.forms and (team, False) not in self.ratings.forms:
+                return 1.0, 1.0, np.nan
+            # домакин: вкарани у дома, допуснати = вкараните от отбора като гост (и обратно)
+            goals_for = self.ratings.scored(team, is_home)
+            goals_against = self.ratings.scored(team, not is_home)
+        elif team not in self.team_index:
+            return 1.0, 1.0, np.nan
+        else:
+            goals_for, goals_against = self._form(team, is_home, last_matches)
+        return relative_strength(goals_for, goals_against, is_home, self.mean_home_goals, self.mean_away_goals)
+
+    def match_strength(self, home, away, as_of=None):
+        # (атака домакин, защита домакин, атака гост, защита гост) - един lookup, споделен от анализаторите
+        home_attack, home_defense, _ = self.team_strength(home, True, as_of=as_of)
+        away_attack, away_defense, _ = self.team_strength(away, False, as_of=as_of)
+        return home_attack, home_defense, away_attack, away_defense
 
-def team_strength(team, is_home, last_matches=10):
-    df_team = data[(data['HomeTeam'] == team) | (data['AwayTeam'] == team)]
-    if df_team.empty:
-        return 1.0, 1.0, np.nan
+    def match_lambdas(self, home, away, strength=None):
+        # (λ домакин, λ гост) за мача спрямо средните на лигата; `strength` - вече взетият match_strength
+        lambdas = expected_goals(self.mean_home_goals, self.mean_away_goals,
+                                 *(strength or self.match_strength(home, away)))
+        return float(lambdas[0]), float(lambdas[1])
 
-    if is_home:
-        goals_for = weighted_avg(df_team[df_team['HomeTeam'] == team], 'FTHG', last_matches)
-        goals_against = weighted_avg(df_team[df_team['AwayTeam'] == team], 'FTAG', last_matches)
-    else:
-        goals_for = weighted_avg(df_team[df_team['AwayTeam'] == team], 'FTAG', last_matches)
-        goals_against = weighted_avg(df_team[df_team['HomeTeam'] == team], 'FTHG', last_matches)
+    def has_counts(self, columns):
+        # колоните ги има в поне един мач на лигата
+        return all(self.totals[col][1] for col in columns)
 
+    def count_rate(self, team, is_home, column, last_matches=RATING_WINDOW):
+        """
+        Претеглено средно на `column` (HC, AY, ...) в последните мачове на отбора
+        на този терен; NaN, ако отборът няма мачове там.
+        """
+        if last_matches == RATING_WINDOW:
+            rates = self.count_rates.get((team, is_home))
+        elif team in self.team_index:
+            rates = team_rates(self.data, self.team_index, last_matches, [team]).get((team, is_home))
+        else:
+            rates = None
+        return np.nan if rates is None else float(rates[COUNT_COLUMNS.index(column)])
+
+    def historical_btts_rate(self, home, away, last_matches=20):
+        # Дял на мачовете с гол и за двата отбора в последните мачове на всеки отбор
+        btts = (self.goals['FTHG'] > 0) & (self.goals['FTAG'] > 0)
+        rates = []
+        for team in (home, away):
+            if team not in self.team_index:
+                continue
+            rows = np.union1d(*self.team_index[team])[-last_matches:]
+            if len(rows) > 0:
+                rates.append(btts[rows].mean())
+        if not rates:
+            return float(btts.mean()) if len(btts) else np.nan
+        return float(np.mean(rates))
+
+    def last_played(self):
+        # последна дата с мач за всеки отбор в лигата (за избор на лига при смяна на дивизия)
+        return {team: self.dates[max(rows[-1] for rows in index if len(rows))]
+                for team, index in self.team_index.items()}
+
+
+def relative_strength(goals_for, goals_against, is_home, mean_home_goals, mean_away_goals):
+    # формата, разделена на средните на лигата -> (атака, защита, nan)
     league_off = mean_home_goals if is_home else mean_away_goals
     attack = (goals_for / league_off) if league_off and league_off>0 else 1.0
     defense = (goals_against / (mean_away_goals if is_home else mean_home_goals)) if (mean_away_goals if is_home else mean_home_goals) else 1.0
 
     return float(attack), float(defense), np.nan
+
+
+LAMBDA_BOUNDS = (0.1, 5.0)  # граници на очакваните голове на отбор
+
+def expected_goals(mean_home_goals, mean_away_goals, home_attack, home_defense, away_attack, away_defense):
+    """
+    (λ домакин, λ гост) от силите на отборите и средните на лигата, в LAMBDA_BOUNDS.
+    Една формула за анализаторите, /api/batch, бектеста и скенера (скалари или масиви).
+    """
+    lambda_home = mean_home_goals * (home_attack / np.fmax(0.1, away_defense))
+    lambda_away = mean_away_goals * (away_attack / np.fmax(0.1, home_defense))
+    return np.clip(lambda_home, *LAMBDA_BOUNDS), np.clip(lambda_away, *LAMBDA_BOUNDS)
+
+
+class Snapshot:
+    """
+    Неизменима снимка на мачовете, разделена по лиги (`leagues`). Презареждането
+    заменя цялата снимка наведнъж, така че текущите заявки довършват със старата.
+    """
+
+    def __init__(self, leagues, sources, duplicates=(), registry=None, h2h=None):
+        self.leagues = leagues
+        self.sources = sources
+        # директните срещи (H2HIndex): строят се при първата употреба, после се обновяват
+        self._h2h = h2h
+        # речник на отборите: име -> id (кодовете на HomeTeam/AwayTeam във всички лиги)
+        self.registry = registry if registry is not None else TeamRegistry()
+        # отчет за обединените дубликати: [{'kept': файл, 'dropped': файл, 'matches': брой}]
+        self.duplicates = list(duplicates)
+        # live резултатите (ingest_result) също сменят отпечатъка -> кешът на прогнозите се изчиства
+        version = sum(league.ratings.version for league in leagues.values())
+        self.fingerprint = _fingerprint(sources) + (f"+{version}" if version else "")
+        # отбор -> лига; отбор, сменил дивизията, отива в лигата с последния си мач
+        last = {}
+        for name, league in leagues.items():
+            for team, date in league.last_played().items():
+                if team not in last or np.isnat(last[team][0]) or date >= last[team][0]:
+                    last[team] = (date, name)
+        self.team_league = {team: name for team, (_, name) in last.items()}
+        self.teams = sorted(self.team_league)
+        # за мач без познати отбори - най-голямата лига
+        self.default_league = max(leagues, key=lambda name: len(leagues[name].data)) if leagues else None
+
+    @functools.cached_property
+    def data(self):
+        # всички лиги в един DataFrame (само за инструменти/справки; заявките ползват league_for)
+        return _categorize(pd.concat([league.data for league in self.leagues.values()], ignore_index=True),
+                           self.registry)
+
+    @property
+    def h2h(self):
+        """
+        Индексът на директните срещи от всички лиги (+ live резултатите).
+        """
+        if self._h2h is None:
+            self._h2h = H2HIndex().with_results(
+                [row for league in self.leagues.values() for row in _h2h_rows(league.data)]
+                + [_h2h_live(result) for league in self.leagues.values() for result in league.ratings.live.values()])
+        return self._h2h
+
+    def head_to_head(self, home, away, last=H2H_WINDOW):
+        # агрегатите на последните `last` директни срещи (None - всички) или None, ако не са се срещали
+        return self.h2h.stats(home, away, last)
+
+    @functools.cached_property
+    def team_search(self):
+        # индексът за търсене на отбори (/api/teams) - строи се при първото търсене в снимката
+        leagues = {}
+        for name, league in self.leagues.items():
+            for team in league.team_index:
+                leagues.setdefault(team, set()).add(name)
+        return TeamSearch(self.teams, self.registry.aliases, leagues)
+
+    def league_for(self, home, away):
+        """
+        Лигата (дялът), в която се оценява мачът: общата лига на двата отбора,
+        иначе лигата на домакина (на госта, ако домакинът е непознат).
+        """
+        home_league, away_league = self.team_league.get(home), self.team_league.get(away)
+        name = home_league or away_league or self.default_league
+        if home_league and away_league and home_league != away_league:
+            if home in self.leagues[away_league].team_index and away not in self.leagues[home_league].team_index:
+                name = away_league
+        return self.leagues[name]
+
+    def team_strength(self, team, is_home, last_matches=10, as_of=None):
+        league = self.leagues.get(self.team_league.get(team))
+        if league is None:
+            return 1.0, 1.0, np.nan
+        return league.team_strength(team, is_home, last_matches, as_of)
+
+    def match_strength(self, home, away, as_of=None):
+        return self.league_for(home, away).match_strength(home, away, as_of)
+
+    def historical_btts_rate(self, home, away, last_matches=20):
+        return self.league_for(home, away).historical_btts_rate(home, away, last_matches)
+
+
+def _registry(data, registry=None):
+    # регистърът на отборите + непознатите имена от data (при първо зареждане - по азбучен ред)
+    names = pd.concat([data['HomeTeam'].astype(object), data['AwayTeam'].astype(object)]).dropna().unique()
+    if registry is None:
+        return TeamRegistry(sorted(names))
+    return registry.with_names(names)
+
+def _categorize(data, registry):
+    # Отборите като категория с кодове = id от регистъра (общ за домакин, гост и всички лиги)
+    for col in ('HomeTeam', 'AwayTeam'):
+        if data[col].dtype != registry.dtype:
+            data[col] = registry.categorical(data[col])
+    for col in ('Div', 'File'):
+        data[col] = data[col].astype(object).astype('category')
+    return data
+
+def build_league(name, data):
+    """
+    Пълно изграждане на дял: индекс по отбори (позиции на домакинските и
+    гостуващите мачове в реда на data) и форма за всеки отбор и терен.
+    """
+    home_rows = data.groupby('HomeTeam', sort=False, observed=True).indices
+    away_rows = data.groupby('AwayTeam', sort=False, observed=True).indices
+    team_index = {team: (home_rows.get(team, _no_rows), away_rows.get(team, _no_rows))
+                  for team in set(home_rows).union(away_rows)}
+    goals = {col: data[col].fillna(0).to_numpy(dtype=float) for col in GOAL_COLUMNS}
+    totals = _column_totals(data)
+    ratings = RatingStore.from_index(team_index, goals, totals, RATING_WINDOW)
+    return League(name, data, totals, goals, team_index, ratings)
+
+def _chronological(data):
+    # стабилно сортиране по дата и час: при равни остава редът от файловете; NaT накрая
+    return data.sort_values('Date', kind='stable', na_position='last').reset_index(drop=True)
+
+def _rebuild_league(league, rows, registry):
+    # нови мачове отпреди последния зареден -> дялът се преизгражда в хронологичен ред,
+    # live резултатите, които още не са в CSV файловете, се добавят отново
+    merged = _categorize(pd.concat([league.data, rows], ignore_index=True), registry)
+    rebuilt = build_league(league.name, _chronological(merged))
+    live = [result for key, result in league.ratings.live.items() if not _has_result(rebuilt, key)]
+    ratings = rebuilt.ratings.with_results(live, live=True)
+    return League(rebuilt.name, rebuilt.data, rebuilt.totals, rebuilt.goals, rebuilt.team_index, ratings,
+                  rebuilt.count_rates)
+
+def extend_league(league, rows, registry):
+    """
+    Дялът + новите редове. Ако новите мачове са след последния зареден, само те
+    минават през RatingStore (участвалите отбори); иначе дялът се преизгражда.
+    """
+    rows = _chronological(rows)
+    if len(league.dates) and (np.isnat(league.dates[-1]) or rows['Date'].iloc[0] < league.dates[-1]):
+        return _rebuild_league(league, rows, registry)
+
+    offset = len(league.data)
+    merged = _categorize(pd.concat([league.data, rows], ignore_index=True), registry)
+    rows = merged.iloc[offset:]
+
+    team_index = dict(league.team_index)
+    changed = set()
+    for team, new_rows in rows.groupby('HomeTeam', observed=True).indices.items():
+        home_rows, away_rows = team_index.get(team, (_no_rows, _no_rows))
+        team_index[team] = (np.concatenate([home_rows, offset + new_rows]), away_rows)
+        changed.add(team)
+    for team, new_rows in rows.groupby('AwayTeam', observed=True).indices.items():
+        home_rows, away_rows = team_index.get(team, (_no_rows, _no_rows))
+        team_index[team] = (home_rows, np.concatenate([away_rows, offset + new_rows]))
+        changed.add(team)
+    # броячите (корнери, картони) се преизчисляват само за отборите с нови мачове
+    count_rates = dict(league.count_rates)
+    count_rates.update(team_rates(merged, team_index, RATING_WINDOW, changed))
+
+    goals = {col: np.concatenate([league.goals[col], rows[col].fillna(0).to_numpy(dtype=float)])
+             for col in GOAL_COLUMNS}
+    new_totals = _column_totals(rows)
+    totals = {name: (value + new_totals[name][0], count + new_totals[name][1])
+              for name, (value, count) in league.totals.items()}
+
+    # мач, вече подаден през ingest_result, не се брои втори път, когато дойде и от CSV
+    live = league.ratings.live
+    results = ((home, away, fthg, ftag, result_key(date, home, away) if live else None)
+               for home, away, fthg, ftag, date in zip(rows['HomeTeam'], rows['AwayTeam'],
+                                                       goals['FTHG'][offset:], goals['FTAG'][offset:],
+                                                       rows['Date']))
+    ratings = league.ratings.with_results(results)
+    return League(league.name, merged, totals, goals, team_index, ratings, count_rates)
+
+def _split_leagues(data):
+    # Div -> редовете на лигата, подредени хронологично
+    return {str(name): _chronological(data.iloc[rows])
+            for name, rows in data.groupby('Div', observed=True).indices.items()}
+
+def build_snapshot(data, sources, duplicates=()):
+    registry = _registry(data)
+    data = _categorize(data, registry)
+    return Snapshot({name: build_league(name, rows) for name, rows in _split_leagues(data).items()},
+                    sources, duplicates, registry)
+
+def extend_snapshot(snapshot, rows, sources):
+    """
+    Нова снимка = старата + новите редове; преизграждат се само лигите, в които има нови мачове.
+    """
+    leagues = dict(snapshot.leagues)
+    duplicates = snapshot.duplicates
+    registry = snapshot.registry
+    h2h = snapshot._h2h
+    if rows is not None and len(rows):
+        rows, merged = _drop_loaded(snapshot, rows)
+        duplicates = _merge_report([], duplicates + merged)
+        registry = _registry(rows, registry)
+        rows = _categorize(rows, registry)
+        for name, league_rows in _split_leagues(rows).items():
+            leagues[name] = (extend_league(leagues[name], league_rows, registry) if name in leagues
+                             else build_league(name, league_rows))
+        # H2H индексът (ако вече е изграден) се обновява само за двойките с нови срещи
+        h2h = h2h.with_results(_h2h_rows(rows)) if h2h is not None else None
+    return Snapshot(leagues, sources, duplicates, registry, h2h)
+
+# --- Споделена снимка: data/.cache/snapshot.bin ---
+# preload() записва готовата снимка (мачовете на всички лиги, индекса по отбори,
+# формата и броячите) като плоски масиви в един файл. Всеки gunicorn worker го
+# отваря read-only през np.memmap: не парсва CSV файловете и не държи собствено
+# копие на корпуса - страниците на файла са общи за всички процеси.
+STORE_FILE = 'snapshot.bin'
+STORE_VERSION = 2
+
+def store_path(files=None):
+    files = csv_files() if files is None else files
+    base = os.path.dirname(os.path.abspath(files[0])) if files else 'data'
+    return os.path.join(base, '.cache', STORE_FILE)
+
+def _store_fresh(meta, states):
+    # файлът е записан от същите CSV файлове (име, mtime, размер) и със същите настройки
+    sources = {os.path.basename(file): list(state) for file, state in states.items()}
+    return (meta.get('version') == STORE_VERSION and meta.get('key') == _CACHE_KEY
+            and meta.get('sources') == sources)
+
+def save_store(snapshot, path=None):
+    """
+    Записва снимката като плоски масиви за open_store(). Live резултатите се
+    записват заедно с формата - за споделения файл снимката трябва да е от load_snapshot().
+    """
+    registry = snapshot.registry
+    leagues = list(snapshot.leagues.values())
+    data = snapshot.data
+    arrays, columns = {}, []
+    for i, col in enumerate(data.columns):
+        values = data[col]
+        if values.dtype == object:
+            values = values.astype('category')  # текстовите колони (League) - като кодове
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[f'column{i}'] = values.cat.codes.to_numpy()
+            columns.append([str(col), [str(c) for c in values.cat.categories]])
+        else:
+            arrays[f'column{i}'] = values.to_numpy()
+            columns.append([str(col), None])
+    arrays['bounds'] = np.cumsum([0] + [len(league.data) for league in leagues])
+    arrays['goals'] = np.concatenate([np.stack([league.goals[col] for col in GOAL_COLUMNS])
+                                      for league in leagues], axis=1)
+
+    # индекс по отбори: (лига, id, начало домакин, начало гост, край) в общия масив с позиции
+    slots, rows, offset = [], [_no_rows], 0
+    ratings = ([], [np.empty((0, 2, RATING_WINDOW))], [np.empty((0, 2))])
+    counts = ([], [np.empty((0, len(COUNT_COLUMNS)))])
+    for number, league in enumerate(leagues):
+        for team, (home_rows, away_rows) in league.team_index.items():
+            slots.append((number, registry.id_of(team), offset, offset + len(home_rows),
+                          offset + len(home_rows) + len(away_rows)))
+            rows += [home_rows, away_rows]
+            offset += len(home_rows) + len(away_rows)
+        keys, values, sums = league.ratings.tables()
+        ratings[0].extend((number, registry.id_of(team), is_home) for team, is_home in keys)
+        ratings[1].append(values)
+        ratings[2].append(sums)
+        counts[0].extend((number, registry.id_of(team), is_home) for team, is_home in league.count_rates)
+        counts[1].append(np.array(list(league.count_rates.values())).reshape(-1, len(COUNT_COLUMNS)))
+    arrays['index_slots'] = np.array(slots, dtype=np.int64).reshape(-1, 5)
+    arrays['index_rows'] = np.concatenate(rows).astype(np.intp)
+    arrays['ratings_keys'] = np.array(ratings[0], dtype=np.int64).reshape(-1, 3)
+    arrays['ratings_values'] = np.concatenate(ratings[1])
+    arrays['ratings_sums'] = np.concatenate(ratings[2])
+    arrays['counts_keys'] = np.array(counts[0], dtype=np.int64).reshape(-1, 3)
+    arrays['counts_rates'] = np.concatenate(counts[1])
+
+    meta = {'version': STORE_VERSION, 'key': _CACHE_KEY,
+            'sources': {os.path.basename(file): list(state) for file, state in snapshot.sources.items()},
+            'leagues': [{'name': league.name, 'totals': league.totals, 'ratings': league.ratings.totals}
+                        for league in leagues],
+            'columns': columns, 'teams': registry.names, 'duplicates': snapshot.duplicates}
+    path = path or store_path(list(snapshot.sources))
+    save_arrays(arrays, meta, path)
+    return path
+
+def _league_slice(keys, number):
+    # редовете на лигата `number` в таблица, подредена по лига
+    return range(*np.searchsorted(keys[:, 0], [number, number + 1]))
+
+def open_store(states, path=None):
+    """
+    Снимката от споделения файл, ако е записан за същите CSV файлове; иначе None.
+    Колоните, позициите, головете и броячите остават изгледи към страниците на файла.
+    """
+    try:
+        meta, arrays = map_arrays(path or store_path(list(states)))
+    except (OSError, ValueError):
+        return None
+    if not _store_fresh(meta, states):
+        return None
+
+    registry = TeamRegistry(meta['teams'])
+    dtypes = [registry.dtype if name in ('HomeTeam', 'AwayTeam')
+              else None if categories is None else pd.CategoricalDtype(categories)
+              for name, categories in meta['columns']]
+    bounds, goals = arrays['bounds'], arrays['goals']
+    slots, rows = arrays['index_slots'], arrays['index_rows']
+    leagues = {}
+    for number, entry in enumerate(meta['leagues']):
+        start, end = bounds[number], bounds[number + 1]
+        columns = {}
+        for i, ((name, _), dtype) in enumerate(zip(meta['columns'], dtypes)):
+            values = arrays[f'column{i}'][start:end]
+            columns[name] = values if dtype is None else pd.Categorical.from_codes(values, dtype=dtype,
+                                                                                   validate=False)
+        data = pd.DataFrame(columns, copy=False)
+
+        team_index = {}
+        for i in _league_slice(slots, number):
+            _, team, home_start, away_start, stop = slots[i].tolist()
+            team_index[registry.names[team]] = (rows[home_start:away_start], rows[away_start:stop])
+        keys = arrays['ratings_keys']
+        part = _league_slice(keys, number)
+        ratings = RatingStore.from_tables(
+            [(registry.names[team], bool(is_home)) for _, team, is_home in keys[part.start:part.stop].tolist()],
+            arrays['ratings_values'][part.start:part.stop], arrays['ratings_sums'][part.start:part.stop],
+            {col: tuple(value) for col, value in entry['ratings'].items()}, RATING_WINDOW)
+        keys = arrays['counts_keys']
+        count_rates = {(registry.names[int(keys[i, 1])], bool(keys[i, 2])): arrays['counts_rates'][i]
+                       for i in _league_slice(keys, number)}
+
+        league_goals = {col: goals[k, start:end] for k, col in enumerate(GOAL_COLUMNS)}
+        totals = {name: tuple(value) for name, value in entry['totals'].items()}
+        leagues[entry['name']] = League(entry['name'], data, totals, league_goals, team_index, ratings,
+                                        count_rates)
+    return Snapshot(leagues, states, meta['duplicates'], registry)
+
+def preload(path=None):
+    """
+    Стъпката преди стартиране на workers: записва споделения файл на снимката,
+    ако липсва или е остарял. Връща пътя към файла.
+    """
+    files = csv_files()
+    states = _file_states(files)
+    path = path or store_path(files)
+    try:
+        if _store_fresh(read_meta(path)[0]['meta'], states):
+            return path
+    except (OSError, ValueError):
+        pass
+    snapshot = dataset.current() if dataset.loaded else None
+    if (snapshot is None or snapshot.sources != states
+            or any(league.ratings.live for league in snapshot.leagues.values())):
+        snapshot = load_snapshot()
+    return save_store(snapshot, path)
+
+def load_snapshot():
+    # Споделеният файл от preload() (ако е за същите CSV файлове) - без парсване;
+    # иначе обединеният DataFrame идва от колонковия кеш (data/.cache) и CSV-тата
+    # се парсват само ако са нови или променени
+    files = csv_files()
+    states = _file_states(files)
+    snapshot = open_store(states)
+    if snapshot is not None:
+        return snapshot
+    data = load_csv_cached(files, _read_csv, name='analyzers', key=_CACHE_KEY, combine=_combine)
+    if data is None:
+        raise Exception("❌ Няма валидни CSV файлове в data/ !")
+    # отчетът не остава в attrs - pandas го копира (deepcopy) във всеки производен DataFrame
+    duplicates = data.attrs.pop('combine', None) or []
+    if duplicates:
+        print("🔁 Обединени дубликати: " + ", ".join(
+            f"{d['dropped']} -> {d['kept']} ({d['matches']})" for d in duplicates), file=sys.stderr)
+    return build_snapshot(data, states, duplicates)
+
+def result_key(date, home, away):
+    # ключ на мач за live резултатите: (дата ISO или None, домакин, гост);
+    # мачове без дата не се дедуплицират (RatingStore.with_results)
+    if date is None or (not isinstance(date, str) and pd.isna(date)):
+        return None, home, away
+    if isinstance(date, str) and date[:4].isdigit():
+        date = pd.to_datetime(date)  # ISO (2025-08-16) от фийдовете
+    return pd.to_datetime(date, dayfirst=True).date().isoformat(), home, away
+
+def _has_result(league, key):
+    # мачът вече е в заредените данни (търсим само сред домакинските мачове на отбора)
+    date, home, away = key[:3]
+    if home not in league.team_index:
+        return False
+    rows = league.data.iloc[league.team_index[home][0]]
+    rows = rows[rows['AwayTeam'] == away]
+    if date is None or 'Date' not in rows or len(rows) == 0:
+        return False
+    return any(result_key(d, home, away) == key for d in rows['Date'])
+
+def _h2h_rows(data):
+    # редовете на мачовете -> (домакин, гост, голове, ден) за H2HIndex
+    return zip(data['HomeTeam'], data['AwayTeam'], data['FTHG'], data['FTAG'], match_days(data['Date']))
+
+def _h2h_live(result):
+    # live резултат (home, away, fthg, ftag, ключ) -> ред за H2HIndex; денят е в ключа
+    home, away, fthg, ftag, key = result
+    return home, away, fthg, ftag, key[0] if key else None
+
+def _with_live(snapshot, league, results):
+    ratings = league.ratings.with_results(results, live=True)
+    if ratings is league.ratings:
+        return snapshot
+    leagues = dict(snapshot.leagues)
+    leagues[league.name] = League(league.name, league.data, league.totals, league.goals,
+                                  league.team_index, ratings, league.count_rates)
+    h2h = snapshot._h2h.with_results(map(_h2h_live, results)) if snapshot._h2h is not None else None
+    return Snapshot(leagues, snapshot.sources, snapshot.duplicates, snapshot.registry, h2h)
+
+
+class Dataset:
+    """
+    Данните на приложението като изричен обект: снимката се зарежда при първото
+    current() или от warm_up() (напр. при стартиране на worker), а не при import.
+    refresh() и ingest_result() сменят снимката атомарно под `lock`.
+    """
+
+    def __init__(self, loader=load_snapshot):
+        self.loader = loader
+        self.lock = threading.RLock()
+        self._snapshot = None
+        self.load_seconds = None  # колко е отнело първото зареждане
+
+    @property
+    def loaded(self):
+        return self._snapshot is not None
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self.lock:
+                if self._snapshot is None:
+                    start = time.perf_counter()
+                    with span('data_load'):
+                        self._snapshot = self.loader()
+                    self.load_seconds = time.perf_counter() - start
+                snapshot = self._snapshot
+        return snapshot
+
+    def warm_up(self):
+        """
+        Зарежда снимката предварително, за да не я плати първата заявка. Връща я.
+        """
+        return self.current()
+
+    def replace(self, snapshot):
+        # атомарна смяна - четящите взимат или старата, или новата снимка
+        self._snapshot = snapshot
+
+
+dataset = Dataset()
+
+def current():
+    """
+    Текущата снимка на данните (зарежда се при първото извикване). Една заявка
+    трябва да работи с една снимка.
+    """
+    return dataset.current()
+
+def _same_prefix(old, new):
+    # новият файл започва със същите мачове като заредените -> само са добавени редове
+    if len(new) < len(old):
+        return False
+    # заредените редове са в хронологичен ред -> сравняваме със същото подреждане на началото
+    cols = ['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG']
+    cols = [c for c in cols if c in old.columns and c in new.columns]
+    prefix = _chronological(new.iloc[:len(old)])
+    return (old[cols].astype(str).to_numpy() == prefix[cols].astype(str).to_numpy()).all()
+
+def _file_rows(snapshot):
+    # име на файл -> заредените му редове (един файл е в една лига)
+    rows = {}
+    for league in snapshot.leagues.values():
+        for fname, idx in league.data.groupby('File', observed=True).indices.items():
+            rows.setdefault(fname, []).append(league.data.iloc[idx])
+    return {fname: pd.concat(parts, ignore_index=True) for fname, parts in rows.items()}
+
+def refresh():
+    """
+    Проверява data/ за променени файлове. Ако към файл са само добавени редове,
+    новите редове се добавят към лигите им; иначе (изтрит/пренаписан файл) се
+    зарежда наново през кеша. Връща True, ако снимката е сменена.
+    """
+    with dataset.lock:
+        if not dataset.loaded:
+            return False  # първото зареждане ще прочете файловете такива, каквито са
+        snapshot = dataset.current()
+        files = csv_files()
+        states = _file_states(files)
+        if states == snapshot.sources:
+            return False
+
+        full_reload = bool(set(snapshot.sources) - set(states))
+        appended = []
+        if not full_reload:
+            file_rows = _file_rows(snapshot)
+            for file in files:
+                if snapshot.sources.get(file) == states[file]:
+                    continue
+                df = _read_csv(file)
+                old_rows = file_rows.get(os.path.basename(file))
+                if df is None:
+                    full_reload = full_reload or old_rows is not None
+                elif old_rows is None and file in snapshot.sources:
+                    full_reload = True  # всичките му мачове са били дубликати - отчетът се прави наново
+                elif old_rows is None:
+                    appended.append(df)  # нов файл
+                elif _same_prefix(old_rows, df):
+                    appended.append(df.iloc[len(old_rows):])
+                else:
+                    full_reload = True
+
+        if full_reload:
+            new_snapshot = load_snapshot()
+            # live резултатите, които още не са стигнали до CSV файловете, се пренасят
+            for league in snapshot.leagues.values():
+                for key, result in league.ratings.live.items():
+                    target = new_snapshot.leagues.get(league.name) or new_snapshot.league_for(key[1], key[2])
+                    if not _has_result(target, key):
+                        new_snapshot = _with_live(new_snapshot, new_snapshot.leagues[target.name], [result])
+        else:
+            rows = pd.concat(appended, ignore_index=True) if appended else None
+            new_snapshot = extend_snapshot(snapshot, rows, states)
+        dataset.replace(new_snapshot)
+        return True
+
+def ingest_results(results, league=None):
+    """
+    Добавя изиграни мачове (home, away, fthg, ftag, date) - напр. от live фийд -
+    без презареждане на корпуса: обновяват се само формата на отборите и средните
+    на лигата им (или на `league`). Всички мачове се проверяват, преди да се
+    промени нещо, и снимката се сменя веднъж: непознат отбор, лига или дата ->
+    ValueError и нищо не е добавено. Повторно подаден мач (същата дата и отбори)
+    или мач, който вече е в CSV файловете, се пропуска. Връща броя добавени мачове.
+    """
+    with dataset.lock:
+        snapshot = dataset.current()
+        if league is not None and league not in snapshot.leagues:
+            raise ValueError(f"Непозната лига '{league}'")
+        checked = []
+        for i, (home, away, fthg, ftag, date) in enumerate(results):
+            # името от фийда -> името в данните (интервали, главни букви, псевдоними)
+            home, away = snapshot.registry.canonical(home), snapshot.registry.canonical(away)
+            unknown = [team for team in (home, away) if team not in snapshot.team_league]
+            if unknown:
+                raise ValueError(f"Мач #{i}: непознат отбор {', '.join(unknown)}")
+            if home == away:
+                raise ValueError(f"Мач #{i}: отборът играе срещу себе си ({home})")
+            try:
+                key = result_key(date, home, away)
+            except (TypeError, ValueError):
+                raise ValueError(f"Мач #{i}: невалидна дата {date!r}") from None
+            checked.append((home, away, fthg, ftag, key))
+
+        new_snapshot, added = snapshot, 0
+        for home, away, fthg, ftag, key in checked:
+            target = new_snapshot.leagues[league] if league else new_snapshot.league_for(home, away)
+            if key[0] is not None and _has_result(target, key):
+                continue
+            updated = _with_live(new_snapshot, target, [(home, away, fthg, ftag, key)])
+            added += updated is not new_snapshot
+            new_snapshot = updated
+        if added:
+            dataset.replace(new_snapshot)
+        return added
+
+def ingest_result(home, away, fthg, ftag, date=None, league=None):
+    # един мач през ingest_results; True, ако снимката е сменена
+    return ingest_results([(home, away, fthg, ftag, date)], league) > 0
+
+_refresher = None
+
+def start_refresher(interval=60, on_refresh=None):
+    """
+    Фонова нишка, която на всеки `interval` секунди проверява data/ за нови резултати;
+    след всяка смяна на снимката вика `on_refresh(снимка)` (напр. dixon_coles.refit).
+    """
+    global _refresher
+    if _refresher is not None or interval <= 0:
+        return _refresher
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                if refresh() and on_refresh is not None:
+                    on_refresh(dataset.current())
+            except Exception as e:
+                print(f"❌ Грешка при презареждане на данните: {e}")
+
+    _refresher = threading.Thread(target=loop, name="data-refresher", daemon=True)
+    _refresher.start()
+    return _refresher
+
+# --- Функции върху текущата снимка ---
+def team_strength(team, is_home, last_matches=10, as_of=None):
+    return current().team_strength(team, is_home, last_matches, as_of)
+
+def match_strength(home, away, as_of=None):
+    return current().match_strength(home, away, as_of)
+
+def historical_btts_rate(home, away, last_matches=20):
+    return current().historical_btts_rate(home, away, last_matches)
+
+def head_to_head(home, away, last=H2H_WINDOW):
+    return current().head_to_head(home, away, last)
@@ -0,0 +1,276 @@
+"""
+Dixon–Coles модел по лиги: атака и защита на всеки отбор, домакинско предимство
+и корекция ρ за резултатите 0:0, 1:0, 0:1 и 1:1. Старите мачове тежат по-малко
+(тежест exp(-ξ · дни преди последния мач на лигата)).
+
+Log-likelihood и градиентът са векторизирани върху всички мачове на лигата;
+оптимизацията е L-BFGS-B от scipy, стартирана от предишния fit. Параметрите се
+пазят в data/.cache/dixon_coles.json и при сервиране λ е само lookup в тях;
+лига се фитва наново само ако мачовете ѝ са се сменили - в preload и във
+фоновото презареждане (refit), никога в заявка.
+
+Стартиране от корена на проекта:
+    python -m analyzers.dixon_coles                   # фит на всички лиги + време за всяка
+    python -m analyzers.dixon_coles --league E0 SP1 --xi 0.0019 --force
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+from analyzers.data import csv_files, current
+from analyzers.metrics import span
+
+XI = 0.0019              # затихване на ден (полуживот ~ 1 година)
+RHO_BOUNDS = (-0.2, 0.2)
+RIDGE = 1e-3             # леко свиване към средния отбор (отбори с малко мачове)
+MODEL_FILE = 'dixon_coles.json'
+MODEL_VERSION = 1
+
+# Мачовете на една лига като масиви за likelihood-а
+Matches = collections.namedtuple('Matches', 'teams home_idx away_idx goals_home goals_away weights log_fact')
+
+
+def league_matches(league, xi=XI):
+    """
+    Изиграните мачове на лигата: индекси на отборите, голове и тежести по давност.
+    """
+    from scipy.special import gammaln  # scipy е нужен само при фит - не при import на модела
+    data = league.data
+    goals_home = data['FTHG'].to_numpy(dtype=float)
+    goals_away = data['FTAG'].to_numpy(dtype=float)
+    played = np.isfinite(goals_home) & np.isfinite(goals_away)
+    names = np.concatenate([data['HomeTeam'].to_numpy(dtype=object)[played],
+                            data['AwayTeam'].to_numpy(dtype=object)[played]])
+    codes, teams = pd.factorize(names)
+    n = int(played.sum())
+
+    dates = league.dates[played]
+    known = ~np.isnat(dates)
+    days = np.zeros(n)
+    if known.any():
+        days[known] = (dates[known].max() - dates[known]) / np.timedelta64(1, 'D')
+        days[~known] = days[known].max()  # мач без дата - като най-стария
+    goals_home, goals_away = goals_home[played], goals_away[played]
+    return Matches(list(teams), codes[:n], codes[n:], goals_home, goals_away,
+                   np.exp(-xi * days), gammaln(goals_home + 1) + gammaln(goals_away + 1))
+
+
+def _fingerprint(matches, xi):
+    h = hashlib.sha1(f"{MODEL_VERSION};{xi};{RIDGE};".encode('utf-8'))
+    h.update('\n'.join(map(str, matches.teams)).encode('utf-8'))
+    for values in (matches.home_idx, matches.away_idx, matches.goals_home, matches.goals_away, matches.weights):
+        h.update(np.ascontiguousarray(values).tobytes())
+    return h.hexdigest()[:16]
+
+
+def neg_log_likelihood(params, matches, ridge=RIDGE):
+    """
+    -Σ w·log L / Σ w (+ наказания за идентифицируемост и свиване) и градиентът ѝ.
+    params = [атака (n), защита (n), домакинско предимство, ρ]; по-голяма
+    "защита" значи повече допуснати голове.
+    """
+    n = len(matches.teams)
+    attack, defense, home, rho = params[:n], params[n:2 * n], params[2 * n], params[2 * n + 1]
+    hi, ai, x, y, w = (matches.home_idx, matches.away_idx, matches.goals_home,
+                       matches.goals_away, matches.weights)
+
+    eta_home = home + attack[hi] + defense[ai]
+    eta_away = attack[ai] + defense[hi]
+    lam, mu = np.exp(eta_home), np.exp(eta_away)
+
+    # корекцията τ засяга само 0:0, 0:1, 1:0 и 1:1
+    m00 = (x == 0) & (y == 0)
+    m01 = (x == 0) & (y == 1)
+    m10 = (x == 1) & (y == 0)
+    m11 = (x == 1) & (y == 1)
+    tau = np.ones_like(lam)
+    tau[m00] = 1 - lam[m00] * mu[m00] * rho
+    tau[m01] = 1 + lam[m01] * rho
+    tau[m10] = 1 + mu[m10] * rho
+    tau[m11] = 1 - rho
+    tau = np.maximum(tau, 1e-10)
+
+    log_lik = np.log(tau) + x * eta_home - lam + y * eta_away - mu - matches.log_fact
+    d_home = x - lam + (m01 * lam * rho - m00 * lam * mu * rho) / tau
+    d_away = y - mu + (m10 * mu * rho - m00 * lam * mu * rho) / tau
+    d_rho = (m01 * lam + m10 * mu - m00 * lam * mu - m11) / tau
+
+    total = w.sum()
+    value = -(w @ log_lik) / total
+    wd_home, wd_away = w * d_home, w * d_away
+    grad = np.empty_like(params)
+    grad[:n] = -(np.bincount(hi, wd_home, n) + np.bincount(ai, wd_away, n)) / total
+    grad[n:2 * n] = -(np.bincount(ai, wd_home, n) + np.bincount(hi, wd_away, n)) / total
+    grad[2 * n] = -wd_home.sum() / total
+    grad[2 * n + 1] = -(w @ d_rho) / total
+
+    # Σ атака = 0 (иначе атака + c, защита - c дава същото) и свиване към нула
+    shift = attack.sum()
+    value += shift ** 2 + ridge * (attack @ attack + defense @ defense)
+    grad[:n] += 2 * shift + 2 * ridge * attack
+    grad[n:2 * n] += 2 * ridge * defense
+    return value, grad
+
+
+def fit_league(league, previous=None, xi=XI, matches=None):
+    """
+    Фит на една лига; `previous` (записаните параметри) е началната точка.
+    Връща параметрите като речник, готов за JSON.
+    """
+    from scipy.optimize import minimize
+    matches = matches if matches is not None else league_matches(league, xi)
+    n = len(matches.teams)
+    x0 = np.zeros(2 * n + 2)
+    x0[2 * n] = 0.25
+    warm = bool(previous) and previous.get('xi') == xi
+    if warm:
+        for i, team in enumerate(matches.teams):
+            x0[i], x0[n + i] = previous['teams'].get(team, (0.0, 0.0))
+        x0[2 * n], x0[2 * n + 1] = previous['home'], previous['rho']
+
+    start = time.perf_counter()
+    with span('dixon_coles_fit'):
+        result = minimize(neg_log_likelihood, x0, args=(matches,), jac=True, method='L-BFGS-B',
+                          bounds=[(None, None)] * (2 * n + 1) + [RHO_BOUNDS])
+    params = result.x
+    return {
+        'fingerprint': _fingerprint(matches, xi),
+        'xi': xi,
+        'teams': {str(team): [float(params[i]), float(params[n + i])] for i, team in enumerate(matches.teams)},
+        'home': float(params[2 * n]),
+        'rho': float(params[2 * n + 1]),
+        'matches': int(len(matches.goals_home)),
+        'objective': float(result.fun),
+        'iterations': int(result.nit),
+        'converged': bool(result.success),
+        'warm_start': warm,
+        'fit_s': time.perf_counter() - start,
+    }
+
+
+class DixonColes:
+    """
+    Фитнатите таблици на всички лиги; прогнозата е само lookup.
+    """
+
+    def __init__(self, leagues):
+        self.leagues = leagues  # лига -> параметри от fit_league
+
+    def params(self, league, home, away):
+        """
+        (λ домакин, λ гост, ρ) за мача; непознат отбор е среден за лигата, непозната лига -> None.
+        """
+        p = self.leagues.get(league)
+        if p is None:
+            return None
+        home_attack, home_defense = p['teams'].get(home, (0.0, 0.0))
+        away_attack, away_defense = p['teams'].get(away, (0.0, 0.0))
+        return (float(np.exp(p['home'] + home_attack + away_defense)),
+                float(np.exp(away_attack + home_defense)), p['rho'])
+
+
+# --- Записване на параметрите (до колонковия кеш в data/.cache) ---
+
+def model_path():
+    files = csv_files()
+    base = os.path.dirname(os.path.abspath(files[0])) if files else 'data'
+    return os.path.join(base, '.cache', MODEL_FILE)
+
+
+def load_params(path=None):
+    try:
+        with open(path or model_path(), encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return stored.get('leagues', {}) if stored.get('version') == MODEL_VERSION else {}
+
+
+def save_params(leagues, path=None):
+    path = path or model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': MODEL_VERSION, 'leagues': leagues}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def fit(snapshot=None, leagues=None, xi=XI, force=False, path=None):
+    """
+    Фитва лигите, чиито мачове са се сменили от записания fit (или всички при
+    force=True), записва таблиците и връща (DixonColes, {лига: параметри на новите фитове}).
+    """
+    snapshot = snapshot or current()
+    stored = load_params(path)
+    tables = {name: stored[name] for name in snapshot.leagues if name in stored}
+    fitted = {}
+    for name in leagues or sorted(snapshot.leagues):
+        league = snapshot.leagues[name]
+        matches = league_matches(league, xi)
+        if not matches.teams:
+            continue
+        previous = stored.get(name)
+        if previous and previous.get('fingerprint') == _fingerprint(matches, xi) and not force:
+            continue
+        tables[name] = fitted[name] = fit_league(league, previous, xi, matches)
+    if fitted:
+        save_params(tables, path)
+    return DixonColes(tables), fitted
+
+
+# последните публикувани таблици; заявките само ги четат, refit() ги сменя атомарно
+_published = None
+_refit_lock = threading.Lock()
+
+
+def refit(snapshot=None):
+    """
+    Фитва променените лиги на снимката и публикува новите таблици за model().
+    Вика се от фоновото презареждане (start_refresher) след смяна на данните.
+    """
+    global _published
+    with _refit_lock:
+        dc, fitted = fit(snapshot)
+        _published = dc
+    return fitted
+
+
+def model():
+    """
+    Публикуваните таблици - без заключване и без фит в заявката. Преди първия
+    refit() се взимат записаните от preload параметри; ако няма такива, таблиците
+    са празни и batch ползва λ от формата с ρ = 0, докато preload, refresher-ът
+    или `python -m analyzers.dixon_coles` не фитнат лигите.
+    """
+    global _published
+    dc = _published
+    if dc is None:
+        dc = _published = DixonColes(load_params())
+    return dc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Фит на Dixon–Coles модела по лиги")
+    parser.add_argument('--league', nargs='+', help="само тези лиги (Div)")
+    parser.add_argument('--xi', type=float, default=XI, help="затихване на ден")
+    parser.add_argument('--force', action='store_true', help="фит и на непроменените лиги")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    dc, fitted = fit(leagues=args.league, xi=args.xi, force=args.force)
+    print(f"{'лига':<18}{'отбори':>8}{'мачове':>8}{'дом.':>7}{'ρ':>8}{'итер.':>7}{'warm':>6}{'fit ms':>9}")
+    for name, p in sorted(fitted.items()):
+        print(f"{name:<18}{len(p['teams']):>8}{p['matches']:>8}{np.exp(p['home']):>7.3f}{p['rho']:>8.3f}"
+              f"{p['iterations']:>7}{'да' if p['warm_start'] else 'не':>6}{p['fit_s'] * 1000:>9.1f}")
+    print(f"фитнати лиги: {len(fitted)} от {len(dc.leagues)}, общо {time.perf_counter() - began:.2f} s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import collections
+import numpy as np
+import pandas as pd
+
+H2H_WINDOW = 5  # последните срещи, от които се смята H2H корекцията
+
+# Една среща: ден (ISO, None за мач без дата), домакин, гост, голове
+Meeting = collections.namedtuple('Meeting', 'day home away fthg ftag')
+
+
+class H2HStats(collections.namedtuple('H2HStats', 'teams matches goals btts hosted goal_diff')):
+    """
+    Агрегати на срещите на двойката `teams` (подредена по азбучен ред):
+    брой, общо голове, мачове с гол и за двата отбора, а по терен - колко пъти
+    всеки отбор е бил домакин и сумата (голове домакин - голове гост) в тези мачове.
+    """
+
+    def as_host(self, team):
+        # (мачове като домакин, сума голова разлика) за отбора от двойката
+        i = self.teams.index(team)
+        return self.hosted[i], self.goal_diff[i]
+
+    @property
+    def btts_rate(self):
+        return self.btts / self.matches if self.matches else np.nan
+
+    @property
+    def goals_per_match(self):
+        return self.goals / self.matches if self.matches else np.nan
+
+
+# Записът на двойка: срещите в хронологичен ред, агрегатите на последните
+# `window` от тях и агрегатите на всички
+H2HEntry = collections.namedtuple('H2HEntry', 'meetings recent total')
+
+
+def pair_key(home, away):
+    # неподредена двойка -> един ключ (по азбучен ред)
+    return (home, away) if home <= away else (away, home)
+
+
+def match_days(dates):
+    """
+    Дати (datetime колона или текст dd/mm/yyyy) -> ISO ден ('2025-08-16'); None за мач без дата.
+    """
+    days = pd.to_datetime(pd.Series(dates), dayfirst=True, format='mixed', errors='coerce')
+    return [None if isinstance(day, float) else day for day in days.dt.strftime('%Y-%m-%d')]
+
+
+def _order(meeting):
+    # мачовете без дата - след всички останали (както NaT в хронологичния ред на лигите)
+    return (meeting.day is None, meeting.day or '')
+
+
+def _empty(teams):
+    return H2HStats(teams, 0, 0.0, 0, (0, 0), (0.0, 0.0))
+
+
+def _add(stats, meeting):
+    host = stats.teams.index(meeting.home)
+    hosted, goal_diff = list(stats.hosted), list(stats.goal_diff)
+    hosted[host] += 1
+    goal_diff[host] += meeting.fthg - meeting.ftag
+    return H2HStats(stats.teams, stats.matches + 1, stats.goals + meeting.fthg + meeting.ftag,
+                    stats.btts + (meeting.fthg > 0 and meeting.ftag > 0), tuple(hosted), tuple(goal_diff))
+
+
+def _stats(teams, meetings):
+    stats = _empty(teams)
+    for meeting in meetings:
+        stats = _add(stats, meeting)
+    return stats
+
+
+class H2HIndex:
+    """
+    Директни срещи по неподредена двойка отбори: срещите в хронологичен ред и
+    агрегатите им (за последните `window` и за всички). Корекцията за H2H е
+    lookup в речник, а нов резултат сменя само записа на своята двойка.
+
+    Индексът не се променя на място: with_results() връща нов, който споделя
+    незасегнатите двойки със стария (както RatingStore).
+    """
+
+    def __init__(self, pairs=None, window=H2H_WINDOW):
+        self.pairs = pairs if pairs is not None else {}  # (отбор, отбор) -> H2HEntry
+        self.window = window
+
+    @classmethod
+    def from_frame(cls, df, window=H2H_WINDOW):
+        """
+        Индекс от DataFrame с HomeTeam, AwayTeam, FTHG, FTAG (и Date, ако я има).
+        """
+        days = match_days(df['Date']) if 'Date' in df.columns else [None] * len(df)
+        return cls(window=window).with_results(zip(df['HomeTeam'], df['AwayTeam'], df['FTHG'], df['FTAG'], days))
+
+    def with_results(self, results):
+        """
+        Нов индекс с добавени резултати (home, away, fthg, ftag, ден). Срещата
+        се вмъква на мястото си по дата; вече записана (същия ден и отбори) или
+        неизиграна (без голове) се пропуска.
+        """
+        results = [Meeting(day, str(home), str(away), float(fthg), float(ftag))
+                   for home, away, fthg, ftag, day in results
+                   if not (pd.isna(home) or pd.isna(away) or pd.isna(fthg) or pd.isna(ftag))]
+        if not results:
+            return self
+        pairs = dict(self.pairs)
+        changed = 0
+        # подредени по дата - при първоначално изграждане всяка среща отива в края
+        for meeting in sorted(results, key=_order):
+            key = pair_key(meeting.home, meeting.away)
+            entry = pairs.get(key)
+            meetings = entry.meetings if entry else ()
+            if meeting.day is not None and any(m.day == meeting.day and m.home == meeting.home
+                                               and m.away == meeting.away for m in meetings):
+                continue
+            i = len(meetings)
+            while i and _order(meetings[i - 1]) > _order(meeting):
+                i -= 1
+            meetings = meetings[:i] + (meeting,) + meetings[i:]
+            total = _add(entry.total if entry else _empty(key), meeting)
+            pairs[key] = H2HEntry(meetings, _stats(key, meetings[-self.window:]), total)
+            changed += 1
+        return H2HIndex(pairs, self.window) if changed else self
+
+    def get(self, home, away):
+        return self.pairs.get(pair_key(home, away))
+
+    def stats(self, home, away, last=H2H_WINDOW):
+        """
+        Агрегатите на последните `last` срещи на двата отбора (None - на всички);
+        None, ако не са се срещали.
+        """
+        entry = self.get(home, away)
+        if entry is None:
+            return None
+        if last is None:
+            return entry.total
+        if last == self.window:
+            return entry.recent
+        return _stats(pair_key(home, away), entry.meetings[-last:])
+
+    def adjustment(self, home, away, per_goal=0.05, max_adjust=0.2, last=H2H_WINDOW):
+        """
+        (корекция домакин, корекция гост) от последните срещи: 1 + per_goal x
+        средната голова разлика на всеки отбор като домакин в двойката, в
+        границите ±max_adjust; 1.0 за отбор, който не е бил домакин на другия.
+        """
+        stats = self.stats(home, away, last)
+        if stats is None:
+            return 1.0, 1.0
+        corrections = []
+        for team in (home, away):
+            hosted, goal_diff = stats.as_host(team)
+            corrections.append(1 + float(np.clip(goal_diff / hosted * per_goal, -max_adjust, max_adjust))
+                               if hosted else 1.0)
+        return tuple(corrections)
@@ -0,0 +1,133 @@
+import bisect
+import cProfile
+import itertools
+import os
+import threading
+import time
+
+# --- Хистограми на латентността (Prometheus text format) ---
+# Границите са в секунди: от 10 µs (lookup на форма) до 10 s (студено зареждане)
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Кумулативна хистограма с фиксирани граници (като prometheus_client, без зависимостта).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+# име на метрика -> етикет -> Histogram
+_metrics = {
+    'football_span_seconds': ('Време на горещите участъци (форма, λ, матрица, шаблон)', 'span', {}),
+    'football_request_seconds': ('Време за обработка на HTTP заявка', 'endpoint', {}),
+}
+_metrics_lock = threading.Lock()
+
+
+def observe(metric, label, seconds):
+    histograms = _metrics[metric][2]
+    histogram = histograms.get(label)
+    if histogram is None:
+        with _metrics_lock:
+            histogram = histograms.setdefault(label, Histogram())
+    histogram.observe(seconds)
+
+
+class span:
+    """
+    Измерва участък от кода: `with span('score_matrix'): ...`
+    Времето отива в хистограмата football_span_seconds{span="..."}.
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe('football_span_seconds', self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _format_le(bound):
+    return f"{bound:g}"
+
+
+def render():
+    """
+    Всички хистограми в текстовия формат на Prometheus (за /metrics).
+    """
+    lines = []
+    for metric, (help_text, label_name, histograms) in _metrics.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for label, histogram in sorted(histograms.items()):
+            counts, total, count = histogram.snapshot()
+            label = str(label).replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, n in zip(histogram.buckets, counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{_format_le(bound)}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{{label_name}="{label}"}} {total}')
+            lines.append(f'{metric}_count{{{label_name}="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+# --- Профилиране на бавни заявки (по желание) ---
+# PROFILE_SLOW_MS=500 -> всяка заявка се профилира с cProfile и ако е по-бавна от
+# 500 ms, статистиката се записва в PROFILE_DIR (по подразбиране profiles/).
+# Профилира се само нишката на заявката (не и пула на анализаторите).
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+_profile_ids = itertools.count(1)
+
+
+def start_profile():
+    if PROFILE_SLOW_MS <= 0:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # друг профайлър вече е активен (напр. паралелна заявка при Python 3.12+)
+        return None
+    return profiler
+
+
+def finish_profile(profiler, name, elapsed):
+    """
+    Спира профайлъра; ако заявката е над прага, записва .prof файл и връща пътя му.
+    """
+    if profiler is None:
+        return None
+    profiler.disable()
+    if elapsed * 1000 < PROFILE_SLOW_MS:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_ids)}"
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{name}-{int(elapsed * 1000)}ms.prof")
+    profiler.dump_stats(path)
+    return path
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from analyzers import data as store
+
+# Сменя се при промяна на формулите в анализаторите - старите прогнози стават невалидни
+MODEL_VERSION = 1
+
+
+class PredictionCache:
+    """
+    Ограничен LRU кеш с TTL за готови прогнози.
+    Изчиства се изцяло, когато отпечатъкът на данните се смени (презареден корпус).
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get_or_compute(self, key, compute, fingerprint=None):
+        now = time.monotonic()
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                if self._items:
+                    self.invalidations += 1
+                self._items.clear()
+                self._fingerprint = fingerprint
+            item = self._items.get(key)
+            if item is not None:
+                expires, value = item
+                if expires > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # изчисляваме извън заключването, за да не блокираме другите заявки
+        value = compute()
+
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                self._items[key] = (now + self.ttl, value)
+                self._items.move_to_end(key)
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_version': MODEL_VERSION,
+                'data_fingerprint': self._fingerprint,
+            }
+
+
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("PREDICTION_CACHE_TTL", 600)),
+)
+
+
+def cached_run(analyzer, run, home, away, **params):
+    """
+    Изпълнява `run(home, away, **params)` през кеша; ключът е
+    (анализатор, домакин, гост, параметри, версия на модела).
+    """
+    key = (analyzer, home, away, tuple(sorted(params.items())), MODEL_VERSION)
+    return prediction_cache.get_or_compute(key, lambda: run(home, away, **params), store.current().fingerprint)
@@ -0,0 +1,25 @@
+"""
+Подготовка преди стартиране на gunicorn workers: записва споделената снимка
+(data/.cache/snapshot.bin) и фитва Dixon–Coles таблиците, ако CSV файловете са
+се сменили. Workers само отварят файла read-only (np.memmap) - без парсване и
+без собствено копие на корпуса, така че всеки нов worker добавя малко RSS.
+
+gunicorn.conf.py я пуска автоматично (on_starting); ръчно от корена на проекта:
+    python -m analyzers.preload
+"""
+import os
+import sys
+import time
+from analyzers import data, dixon_coles
+
+
+def main():
+    began = time.perf_counter()
+    path = data.preload()
+    _, fitted = dixon_coles.fit(data.current())
+    print(f"снимка: {path} ({os.path.getsize(path) / 2**20:.1f} MB), "
+          f"фитнати лиги: {len(fitted)}, {time.perf_counter() - began:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import numpy as np
+
+
+def recency_weights(n):
+    # експоненциалните тежести на формата (weighted_avg, counts): най-старият мач e^-1, последният 1
+    return np.exp(np.linspace(-1, 0, n))
+
+
+class RatingStore:
+    """
+    Форма на отборите по терен: пръстен с последните `window` мача (вкарани и
+    допуснати голове) и претеглените им суми. Нов резултат сменя само записите
+    на двата отбора - O(1), без преизчисляване върху целия корпус.
+
+    Хранилището не се променя на място: with_results() връща ново, което споделя
+    незасегнатите записи със старото (подходящо за атомарна смяна на снимки).
+    """
+
+    def __init__(self, window=10, forms=None, totals=None, live=None, version=0):
+        self.window = window
+        # (отбор, is_home) -> (вкарани, допуснати, сума вкарани, сума допуснати); пръстените са tuple
+        self.forms = forms if forms is not None else {}
+        # (сума, брой) голове на домакини и гости - за средните на лигата
+        self.totals = totals if totals is not None else {'FTHG': (0.0, 0), 'FTAG': (0.0, 0)}
+        # резултати, подадени през ingest (ключ -> резултат), за да не се броят втори път от CSV
+        self.live = live if live is not None else {}
+        self.version = version
+        self._weights = [None] + [recency_weights(n) for n in range(1, window + 1)]
+        self._norms = [None] + [w.sum() for w in self._weights[1:]]
+        # при пълен прозорец тежестите са геометрични: w[i+1] = w[i] * ratio
+        self._ratio = np.exp(1.0 / (window - 1)) if window > 1 else 1.0
+
+    @classmethod
+    def from_index(cls, team_index, goals, totals, window=10):
+        """
+        Начално изграждане от индекса по отбори (последните `window` мача на всеки отбор и терен).
+        """
+        store = cls(window, totals={col: totals[col] for col in ('FTHG', 'FTAG')})
+        for team, (home_rows, away_rows) in team_index.items():
+            for is_home, rows in ((True, home_rows), (False, away_rows)):
+                rows = rows[-window:]
+                if len(rows) == 0:
+                    continue
+                scored = goals['FTHG' if is_home else 'FTAG'][rows]
+                conceded = goals['FTAG' if is_home else 'FTHG'][rows]
+                w = store._weights[len(rows)]
+                store.forms[(team, is_home)] = (tuple(scored.tolist()), tuple(conceded.tolist()),
+                                                float(np.dot(w, scored)), float(np.dot(w, conceded)))
+        return store
+
+    def tables(self):
+        """
+        Формата като плоски масиви (за споделения файл на снимката): ключовете
+        [(отбор, is_home)], последните голове (N, 2, window - вкарани/допуснати,
+        празните места NaN) и претеглените суми (N, 2).
+        """
+        keys = list(self.forms)
+        values = np.full((len(keys), 2, self.window), np.nan)
+        sums = np.zeros((len(keys), 2))
+        for i, key in enumerate(keys):
+            scored, conceded, sum_s, sum_c = self.forms[key]
+            values[i, 0, :len(scored)] = scored
+            values[i, 1, :len(conceded)] = conceded
+            sums[i] = sum_s, sum_c
+        return keys, values, sums
+
+    @classmethod
+    def from_tables(cls, keys, values, sums, totals, window=10):
+        """
+        Обратното на tables(): хранилище от ключовете и масивите.
+        """
+        store = cls(window, totals={col: totals[col] for col in ('FTHG', 'FTAG')})
+        for key, (scored, conceded), (sum_s, sum_c) in zip(keys, values, sums):
+            store.forms[key] = (tuple(scored[~np.isnan(scored)].tolist()),
+                                tuple(conceded[~np.isnan(conceded)].tolist()), float(sum_s), float(sum_c))
+        return store
+
+    def _push(self, state, scored, conceded):
+        values_s, values_c, sum_s, sum_c = state or ((), (), 0.0, 0.0)
+        n = len(values_s)
+        if n < self.window or self.window == 1:
+            values_s = (values_s + (scored,))[-self.window:]
+            values_c = (values_c + (conceded,))[-self.window:]
+            w = self._weights[len(values_s)]
+            return values_s, values_c, float(np.dot(w, values_s)), float(np.dot(w, values_c))
+
+        # пълен прозорец: най-старият мач излиза, останалите се отместват с една позиция
+        w = self._weights[n]
+        sum_s = (sum_s - w[0] * values_s[0]) / self._ratio + w[-1] * scored
+        sum_c = (sum_c - w[0] * values_c[0]) / self._ratio + w[-1] * conceded
+        return values_s[1:] + (scored,), values_c[1:] + (conceded,), sum_s, sum_c
+
+    def with_results(self, results, live=False):
+        """
+        Ново хранилище с добавени резултати (home, away, fthg, ftag, key).
+        При live=True резултатите се запомнят по `key`; вече видян ключ се пропуска.
+        Мач без дата (key[0] is None) не може да се разпознае като повторен -
+        всеки се брои и се пази под собствен ключ (None, home, away, n).
+        """
+        forms = totals = None
+        live_results = self.live
+        added = 0
+        for home, away, fthg, ftag, key in results:
+            if key is not None and key[0] is not None and key in live_results:
+                continue
+            if forms is None:
+                forms, totals = dict(self.forms), dict(self.totals)
+                if live:
+                    live_results = dict(self.live)
+            fthg, ftag = float(fthg), float(ftag)
+            forms[(home, True)] = self._push(forms.get((home, True)), fthg, ftag)
+            forms[(away, False)] = self._push(forms.get((away, False)), ftag, fthg)
+            totals['FTHG'] = (totals['FTHG'][0] + fthg, totals['FTHG'][1] + 1)
+            totals['FTAG'] = (totals['FTAG'][0] + ftag, totals['FTAG'][1] + 1)
+            if live and key is not None:
+                if key[0] is None:
+                    key = key[:3] + (len(live_results),)
+                live_results[key] = (home, away, fthg, ftag, key)
+            added += 1
+
+        if not added:
+            return self
+        return RatingStore(self.window, forms, totals, live_results, self.version + (added if live else 0))
+
+    def scored(self, team, is_home):
+        """
+        Претеглено средно вкарани голове на отбора на този терен (NaN, ако няма мачове).
+        """
+        state = self.forms.get((team, is_home))
+        if state is None:
+            return np.nan
+        return state[2] / self._norms[len(state[0])]
+
+    def conceded(self, team, is_home):
+        state = self.forms.get((team, is_home))
+        if state is None:
+            return np.nan
+        return state[3] / self._norms[len(state[1])]
+
+    def mean(self, col):
+        value, count = self.totals[col]
+        return value / count if count else np.nan
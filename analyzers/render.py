@@ -0,0 +1,118 @@
+"""
+HTML слой на анализаторите: всеки analyze() връща речник с числата (вероятности
+0..1, λ), а функциите тук го превръщат в HTML фрагмента за формата и SSE потока.
+JSON клиентите (/api/predict) взимат речниците директно, без рендериране.
+"""
+
+
+def _lines(result, prefix):
+    # (линия, вероятност) за ключовете prefix<линия>, напр. over_home_3.5 -> (3.5, p)
+    return [(key[len(prefix):], value) for key, value in result.items() if key.startswith(prefix)]
+
+
+def render_1x2(r):
+    html = f"<h2>{r['home']} vs {r['away']}</h2>"
+    html += "<p>Вероятности: 1 (домакин) <b>{:.0%}</b>, X (равен) <b>{:.0%}</b>, 2 (гост) <b>{:.0%}</b></p>".format(
+        r['prob_home'], r['prob_draw'], r['prob_away'])
+    return html
+
+
+def render_goals(r):
+    html = f"<h2>{r['home']} 🆚 {r['away']}</h2>"
+    html += "<p><b>⚽ Анализ: Брой голове (Over/Under)</b></p>"
+    html += f"<p>Over 0.5: {r['over_0.5']*100:.1f}%</p>"
+    html += f"<p>Over 1.5: {r['over_1.5']*100:.1f}%</p>"
+    html += f"<p>Over 2.5 (model): {r['over_2.5']*100:.1f}%</p>"
+    html += f"<p>Over 2.5 (final): {r['over_2.5_final']*100:.1f}%</p>"
+    html += f"<p>Over 3.5: {r['over_3.5']*100:.1f}%</p>"
+    return html
+
+
+def render_btts(r):
+    html = f"<h2>{r['home']} 🆚 {r['away']}</h2>"
+    html += "<p><b>⚡ Анализ: BTTS</b></p>"
+    html += f"<p>Model BTTS: {r['btts']*100:.1f}%</p>"
+    html += f"<p>Historical BTTS (avg teams): {r['btts_historical']*100:.1f}%</p>"
+    html += f"<p>Final BTTS (blended): {r['btts_final']*100:.1f}%</p>"
+    return html
+
+
+def render_corners(r):
+    if 'missing_columns' in r:
+        return "<p>⚠️ CSV файловете нямат колони 'HC' и 'AC' за корнери.</p>"
+    html = f"<h2>{r['home']} 🆚 {r['away']}</h2>"
+    html += "<p><b>🚩 Анализ: Корнери</b></p>"
+
+    # Отделно за домакин
+    html += "<p>Вероятности Over X (домакин):</p>"
+    for t, p in _lines(r, 'over_home_'):
+        html += f"<p>Over {t}: {p*100:.1f}%</p>"
+
+    # Отделно за гост
+    html += "<p>Вероятности Over X (гост):</p>"
+    for t, p in _lines(r, 'over_away_'):
+        html += f"<p>Over {t}: {p*100:.1f}%</p>"
+
+    # Общи корнери
+    html += "<p><b>Общо очаквани корнери:</b></p>"
+    for t, p in _lines(r, 'over_total_'):
+        html += f"<p>Over {t}: {p*100:.1f}%</p>"
+    return html
+
+
+def render_cards(r):
+    if 'missing_columns' in r:
+        return f"<p>⚠️ CSV файловете нямат необходимите колони: {', '.join(r['missing_columns'])}</p>"
+    html = f"<h2>{r['home']} 🆚 {r['away']}</h2>"
+    html += "<p><b>🟨 Анализ: Жълти картони и дисциплина</b></p>"
+    for title, prefix in ((f"{r['home']} - вероятности за Over:", 'over_home_'),
+                          (f"{r['away']} - вероятности за Over:", 'over_away_'),
+                          ("Общо картони - вероятности за Over:", 'over_total_')):
+        html += f"<p><b>{title}</b></p><ul>"
+        for t, p in _lines(r, prefix):
+            html += f"<li>Over {t}: {p*100:.1f}%</li>"
+        html += "</ul>"
+    return html
+
+
+def render_handicap(r):
+    html = f"<h2>{r['home']} 🆚 {r['away']}</h2>"
+    html += "<p><b>📉 Анализ: Хендикап</b></p>"
+    html += f"<p>Home win: {r['prob_home']*100:.1f}% | Draw: {r['prob_draw']*100:.1f}% | Away win: {r['prob_away']*100:.1f}%</p>"
+    html += f"<p>Home covers -0.5: {r['ah_home_-0.5']*100:.1f}%</p>"
+    html += f"<p>Home covers -1 (win by 2+): {r['ah_home_-1']*100:.1f}% (push {r['ah_home_-1_push']*100:.1f}%)</p>"
+    html += f"<p>Away not lose (+0.5): {r['ah_away_+0.5']*100:.1f}%</p>"
+    return html
+
+
+def render_valuebets(r):
+    if r.get('message'):
+        return f"<p>{r['message']}</p>"
+    home, away = r['home'], r['away']
+    html = f"<h2>💰 Value Bets за мача: {home} 🆚 {away}</h2><ul>"
+    labels = {'home': f"🏠 Победа {home}", 'draw': "🤝 Равенство", 'away': f"🚀 Победа {away}"}
+    for outcome in r['value_bets']:
+        html += f"<li>{labels[outcome]}: Value {r['edge_' + outcome]*100:.1f}% " \
+                f"(реална {r['prob_' + outcome]*100:.1f}% vs импл. {r['implied_' + outcome]*100:.1f}%)</li>"
+    if not r['value_bets']:
+        html += "<li>Няма забележими value bets.</li>"
+    html += "</ul>"
+    return html
+
+
+RENDERERS = {
+    '1x2': render_1x2,
+    'goals': render_goals,
+    'btts': render_btts,
+    'corners': render_corners,
+    'cards': render_cards,
+    'handicap': render_handicap,
+    'valuebets': render_valuebets,
+}
+
+
+def render(key, result):
+    """
+    HTML фрагментът на анализатора `key` от речника, върнат от неговия analyze().
+    """
+    return RENDERERS[key](result)
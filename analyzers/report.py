@@ -0,0 +1,104 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from analyzers import data as store
+from analyzers import (analyzer_1x2, analyzer_goals, analyzer_btts, analyzer_corners,
+                       analyzer_cards, analyzer_handicap, analyzer_valuebets)
+from analyzers.render import render
+
+# Всички анализатори в реда, в който се показват:
+# (ключ, заглавие, функция(home, away, strength) -> речник с резултата; HTML-ът е в analyzers/render.py)
+ANALYZERS = [
+    ('1x2', '1X2', analyzer_1x2.analyze),
+    ('goals', 'Голове (Over/Under)', analyzer_goals.analyze),
+    ('btts', 'BTTS', analyzer_btts.analyze),
+    ('corners', 'Корнери', lambda home, away, strength: analyzer_corners.analyze(home, away)),
+    ('cards', 'Картони', lambda home, away, strength: analyzer_cards.analyze(home, away)),
+    ('handicap', 'Хендикап', analyzer_handicap.analyze),
+    ('valuebets', 'Value bets', lambda home, away, strength: analyzer_valuebets.analyze(home, away, store.current().league_for(home, away).data)),
+]
+
+# Таймаут (секунди) за всеки анализатор; DEFAULT_TIMEOUT за неизброените
+DEFAULT_TIMEOUT = float(os.environ.get("ANALYZER_TIMEOUT", 5.0))
+TIMEOUTS = {}
+
+# Анализаторите са NumPy/pandas код (без чисти Python цикли след точната матрица),
+# затова стига общ пул от нишки за всички заявки
+_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("ANALYZER_THREADS", len(ANALYZERS))),
+                           thread_name_prefix="analyzer")
+
+
+def run_analyzer(key, title, analyze, home, away, strength=None, html=True):
+    """
+    Изпълнява един анализатор; грешката се връща като резултат, а не прекъсва отчета.
+    'data' е речникът от analyze(); 'html' се рендерира само при html=True.
+    """
+    start = time.perf_counter()
+    try:
+        data, error = analyze(home, away, strength), None
+        fragment = render(key, data) if html else None
+    except Exception as e:
+        data, error = None, str(e)
+        fragment = f"<p>⚠️ {title}: анализът не успя ({e})</p>" if html else None
+    result = {'key': key, 'title': title, 'data': data, 'error': error,
+              'ms': round((time.perf_counter() - start) * 1000, 2)}
+    if html:
+        result['html'] = fragment
+    return result
+
+
+def _timeout_result(key, title, timeout, html=True):
+    result = {'key': key, 'title': title, 'data': None, 'error': 'timeout', 'ms': round(timeout * 1000, 2)}
+    if html:
+        result['html'] = f"<p>⚠️ {title}: няма резултат до {timeout:g} s</p>"
+    return result
+
+
+def iter_report(home, away, skip=(), timeouts=None, html=True):
+    """
+    Пуска анализаторите паралелно и връща резултатите по реда на завършване.
+    Всички използват една и съща сила на отборите; анализатор, който не приключи
+    в своя таймаут, се връща с error='timeout' (нишката му довършва във фонов режим).
+    При html=False резултатите са само данни (за JSON клиентите).
+    """
+    timeouts = dict(TIMEOUTS, **(timeouts or {}))
+    strength = store.match_strength(home, away)
+    start = time.monotonic()
+
+    pending = {}
+    for key, title, analyze in ANALYZERS:
+        if key in skip:
+            continue
+        future = _pool.submit(run_analyzer, key, title, analyze, home, away, strength, html)
+        timeout = timeouts.get(key, DEFAULT_TIMEOUT)
+        pending[future] = (key, title, timeout, start + timeout)
+
+    while pending:
+        next_deadline = min(deadline for _, _, _, deadline in pending.values())
+        done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            del pending[future]
+            yield future.result()
+        now = time.monotonic()
+        for future, (key, title, timeout, deadline) in list(pending.items()):
+            if deadline <= now:
+                del pending[future]
+                yield _timeout_result(key, title, timeout, html)
+
+
+def run_report(home, away, skip=(), timeouts=None, html=True):
+    """
+    Пълен отчет за мача: резултатите от всички анализатори в реда на ANALYZERS,
+    времето на всеки и общото време (wall-clock) за отчета.
+    """
+    start = time.perf_counter()
+    results = {item['key']: item for item in iter_report(home, away, skip, timeouts, html)}
+    ordered = [results[key] for key, _, _ in ANALYZERS if key in results]
+    return {
+        'home': home,
+        'away': away,
+        'analyzers': ordered,
+        'timings_ms': {item['key']: item['ms'] for item in ordered},
+        'total_ms': round((time.perf_counter() - start) * 1000, 2),
+    }
@@ -0,0 +1,164 @@
+"""
+Value-bet скенер за целия корпус (или за файл с предстоящи мачове) на един
+векторизиран ход: моделните 1X2 вероятности срещу имплицитните от всички
+налични букмейкърски колони (B365*, PS*, Max*, Avg*). Резултатът е таблица,
+подредена по edge. Изиграните мачове от корпуса се оценяват с формата към
+момента на мача (както в бектеста), а не с днешната.
+
+Стартиране от корена на проекта:
+    python -m analyzers.scanner                       # всички мачове в data/
+    python -m analyzers.scanner --fixtures fixtures.csv --min-edge 0.03 --top 30
+    python -m analyzers.scanner --csv value_bets.csv
+"""
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+from analyzers.backtest import walk_lambdas
+from analyzers.batch import fixture_lambdas
+from analyzers.data import current
+from analyzers.score_matrix import score_matrix, outcome_probs
+
+# Префикси на букмейкърите с 1X2 коефициенти (H/D/A); C = затварящи коефициенти
+BOOKMAKERS = ('B365', 'PS', 'Max', 'Avg', 'B365C', 'PSC', 'MaxC', 'AvgC')
+OUTCOMES = ('1', 'X', '2')
+MIN_EDGE = 0.05
+
+# (отпечатък на снимката, (мачове, λ домакин, λ гост)) - корпусът се обхожда веднъж на снимка
+_corpus = (None, None)
+
+TABLE_COLUMNS = ['Div', 'Date', 'HomeTeam', 'AwayTeam', 'bookmaker', 'outcome', 'odds',
+                 'model_prob', 'implied_prob', 'edge', 'ev']
+
+
+def load_fixtures(path):
+    """
+    Файл с предстоящи мачове във формата на football-data (fixtures.csv):
+    HomeTeam, AwayTeam, Div, Date и колоните с коефициенти.
+    """
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, format='mixed', errors='coerce')
+    return df
+
+
+def _resolve(names, registry):
+    # имената от файла -> имената в данните през регистъра (всяко различно име се нормализира веднъж)
+    inverse, uniques = pd.factorize(pd.Series(names, dtype=object))
+    return list(np.array([registry.canonical(name) for name in uniques] + [None], dtype=object)[inverse])
+
+
+def _outcome_probs(lambda_home, lambda_away):
+    # (N, 3) за 1/X/2 - една матрица на резултатите на мач
+    return np.stack(outcome_probs(score_matrix(lambda_home, lambda_away)), axis=1).reshape(-1, 3)
+
+
+def model_probs(homes, aways):
+    """
+    Моделни вероятности (N, 3) за 1/X/2 от текущата форма на отборите.
+    """
+    return _outcome_probs(*fixture_lambdas(list(zip(homes, aways))))
+
+
+def corpus_fixtures(snapshot):
+    """
+    Мачовете от корпуса и (λ домакин, λ гост) за тях без поглед напред:
+    изиграните - от формата само отпреди началния час (walk_lambdas; мачовете
+    без достатъчно история отпадат), неизиграните - от текущата форма.
+    """
+    global _corpus
+    fingerprint, corpus = _corpus
+    if fingerprint == snapshot.fingerprint:
+        return corpus
+    frames, lambdas = [], []
+    for league in snapshot.leagues.values():
+        data = league.data
+        rows, walked = walk_lambdas(data)
+        upcoming = np.flatnonzero((data['FTHG'].isna() | data['FTAG'].isna()).to_numpy())
+        if len(upcoming):
+            pairs = zip(data['HomeTeam'].astype(str).to_numpy()[upcoming],
+                        data['AwayTeam'].astype(str).to_numpy()[upcoming])
+            walked = np.concatenate([walked, np.column_stack(fixture_lambdas(list(pairs)))])
+            rows = np.concatenate([rows, upcoming])
+        frames.append(data.iloc[rows])
+        lambdas.append(walked)
+    lambdas = np.concatenate(lambdas) if lambdas else np.empty((0, 2))
+    fixtures = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['HomeTeam', 'AwayTeam'])
+    corpus = fixtures, lambdas[:, 0], lambdas[:, 1]
+    _corpus = (snapshot.fingerprint, corpus)
+    return corpus
+
+
+def _bookmaker_odds(fixtures, bookmakers):
+    # (имена, коефициенти с форма (N, B, 3)) за букмейкърите с пълни H/D/A колони
+    present = [book for book in bookmakers if all(f'{book}{o}' in fixtures.columns for o in 'HDA')]
+    odds = np.full((len(fixtures), len(present), 3), np.nan)
+    for b, book in enumerate(present):
+        for k, o in enumerate('HDA'):
+            odds[:, b, k] = pd.to_numeric(fixtures[f'{book}{o}'], errors='coerce').to_numpy(dtype=float)
+    # коефициентите в снимката са float32 -> 2.88 вместо 2.880000114440918 (в таблицата и в JSON)
+    return present, np.round(odds, 4)
+
+
+def scan(fixtures=None, min_edge=MIN_EDGE, bookmakers=BOOKMAKERS):
+    """
+    Всички value bets (модел - имплицитна вероятност > min_edge) за мачовете в
+    `fixtures` (DataFrame с предстоящи мачове; по подразбиране корпуса, оценен
+    към датата на всеки мач - corpus_fixtures), подредени по edge.
+    Имплицитните вероятности са без марж (нормализирани за всеки букмейкър).
+    """
+    snapshot = current()
+    lambdas = None
+    if fixtures is None:
+        fixtures, *lambdas = corpus_fixtures(snapshot)
+    fixtures = fixtures.reset_index(drop=True)
+    homes = _resolve(fixtures['HomeTeam'], snapshot.registry)
+    aways = _resolve(fixtures['AwayTeam'], snapshot.registry)
+
+    probs = model_probs(homes, aways) if lambdas is None else _outcome_probs(*lambdas)  # (N, 3)
+    present, odds = _bookmaker_odds(fixtures, bookmakers)      # (N, B, 3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = np.where(odds > 1.0, 1.0 / odds, np.nan)
+        implied = inverse / inverse.sum(axis=2, keepdims=True)
+    edge = probs[:, None, :] - implied
+    hits = np.argwhere(np.nan_to_num(edge, nan=-1.0) > min_edge)
+    if len(hits) == 0:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+
+    rows, books, outcomes = hits.T
+    table = pd.DataFrame({
+        'Div': fixtures['Div'].astype(str).to_numpy()[rows] if 'Div' in fixtures else None,
+        'Date': fixtures['Date'].to_numpy()[rows] if 'Date' in fixtures else pd.NaT,
+        'HomeTeam': np.asarray(homes, dtype=object)[rows],
+        'AwayTeam': np.asarray(aways, dtype=object)[rows],
+        'bookmaker': np.asarray(present, dtype=object)[books],
+        'outcome': np.asarray(OUTCOMES, dtype=object)[outcomes],
+        'odds': odds[rows, books, outcomes],
+        'model_prob': probs[rows, outcomes],
+        'implied_prob': implied[rows, books, outcomes],
+        'edge': edge[rows, books, outcomes],
+    })
+    table['ev'] = table['model_prob'] * table['odds'] - 1.0
+    return table.sort_values(['edge', 'ev'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Value bets за всички мачове наведнъж")
+    parser.add_argument('--fixtures', help="CSV с предстоящи мачове (по подразбиране мачовете в data/)")
+    parser.add_argument('--min-edge', type=float, default=MIN_EDGE)
+    parser.add_argument('--bookmakers', nargs='+', default=list(BOOKMAKERS))
+    parser.add_argument('--top', type=int, default=25, help="колко реда да се покажат")
+    parser.add_argument('--csv', help="записва цялата таблица в CSV файл")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    table = scan(fixtures, args.min_edge, tuple(args.bookmakers))
+    if args.csv:
+        table.to_csv(args.csv, index=False)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.head(args.top).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    print(f"value bets: {len(table)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import numpy as np
+from analyzers.metrics import span
+
+# Горна граница на головете в матрицата. При λ <= 5 опашката след 15 гола е < 1e-4,
+# а остатъкът се пренормализира, така че сумата на матрицата е точно 1.
+MAX_GOALS = 15
+
+
+def poisson_pmf(lam, max_goals=MAX_GOALS):
+    """
+    Poisson вероятности P(0..max_goals) за λ (скалар или масив с форма (N,)).
+    """
+    lam = np.asarray(lam, dtype=float)
+    k = np.arange(1, max_goals + 1)
+    # p[k] = p[k-1] * λ / k  -> без факториели и без scipy
+    ratios = lam[..., None] / k
+    pmf = np.concatenate([np.ones(lam.shape + (1,)), np.cumprod(ratios, axis=-1)], axis=-1)
+    return pmf * np.exp(-lam)[..., None]
+
+
+def score_matrix(lambda_home, lambda_away, max_goals=MAX_GOALS):
+    """
+    Точна (отрязана) матрица на резултатите: m[gh, ga] = P(домакин gh, гост ga).
+    Приема скалари или масиви с еднаква форма (N,) -> (N, G, G).
+    """
+    with span('score_matrix'):
+        ph = poisson_pmf(lambda_home, max_goals)
+        pa = poisson_pmf(lambda_away, max_goals)
+        m = ph[..., :, None] * pa[..., None, :]
+        return m / m.sum(axis=(-2, -1), keepdims=True)
+
+
+def dixon_coles_matrix(lambda_home, lambda_away, rho, max_goals=MAX_GOALS):
+    """
+    Матрицата на резултатите с корекцията τ на Dixon–Coles за 0:0, 0:1, 1:0 и 1:1.
+    """
+    lam, mu, rho = (np.asarray(v, dtype=float) for v in (lambda_home, lambda_away, rho))
+    m = score_matrix(lam, mu, max_goals)
+    m[..., 0, 0] *= np.maximum(1 - lam * mu * rho, 0.0)
+    m[..., 0, 1] *= 1 + lam * rho
+    m[..., 1, 0] *= 1 + mu * rho
+    m[..., 1, 1] *= 1 - rho
+    return m / m.sum(axis=(-2, -1), keepdims=True)
+
+
+# --- Пазари, изведени от матрицата ---
+
+def _goal_diff(max_goals):
+    g = np.arange(max_goals + 1)
+    return g[:, None] - g[None, :]
+
+
+def _total_goals(max_goals):
+    g = np.arange(max_goals + 1)
+    return g[:, None] + g[None, :]
+
+
+def _masked_sum(m, mask):
+    # сума по последните две оси с маска; tensordot работи и за (G, G), и за (N, G, G)
+    return np.tensordot(m, mask.astype(float), axes=([-2, -1], [0, 1]))
+
+
+def outcome_probs(m):
+    """
+    1X2: (домакин, равен, гост).
+    """
+    diff = _goal_diff(m.shape[-1] - 1)
+    home = _masked_sum(m, diff > 0)
+    draw = _masked_sum(m, diff == 0)
+    away = _masked_sum(m, diff < 0)
+    return home, draw, away
+
+
+def over_probs(m, lines=(0.5, 1.5, 2.5, 3.5)):
+    """
+    Over/Under за общия брой голове: {линия: P(общо > линия)}.
+    """
+    total = _total_goals(m.shape[-1] - 1)
+    return {line: _masked_sum(m, total > line) for line in lines}
+
+
+def btts_prob(m):
+    """
+    И двата отбора отбелязват.
+    """
+    return m[..., 1:, 1:].sum(axis=(-2, -1))
+
+
+def asian_handicap_probs(m, line):
+    """
+    Азиатски хендикап за домакина (напр. -0.5, -1, -0.25, +0.75).
+    Връща (печели, връща залога, губи); четвъртите линии се делят на две половини.
+    """
+    if (line * 4) % 2 == 1:
+        halves = [asian_handicap_probs(m, line - 0.25), asian_handicap_probs(m, line + 0.25)]
+        return tuple((a + b) / 2 for a, b in zip(*halves))
+    adjusted = _goal_diff(m.shape[-1] - 1) + line
+    win = _masked_sum(m, adjusted > 0)
+    push = _masked_sum(m, adjusted == 0)
+    lose = _masked_sum(m, adjusted < 0)
+    return win, push, lose
+
+
+def european_handicap_probs(m, handicap):
+    """
+    Европейски (3-изходен) хендикап: 1X2 на резултата с добавени `handicap` гола за домакина.
+    """
+    adjusted = _goal_diff(m.shape[-1] - 1) + handicap
+    home = _masked_sum(m, adjusted > 0)
+    draw = _masked_sum(m, adjusted == 0)
+    away = _masked_sum(m, adjusted < 0)
+    return home, draw, away
+
+
+def most_likely_score(m):
+    """
+    Най-вероятен точен резултат (голове домакин, голове гост) и вероятността му.
+    """
+    gh, ga = np.unravel_index(np.argmax(m), m.shape)
+    return (int(gh), int(ga)), float(m[gh, ga])
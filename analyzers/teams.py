@@ -0,0 +1,176 @@
+import bisect
+import difflib
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# --- Псевдоними: друго изписване (фийдове, fixtures, други източници) -> името в data/ ---
+TEAM_ALIASES = {
+    'Manchester United': 'Man United',
+    'Man Utd': 'Man United',
+    'Manchester City': 'Man City',
+    "Nott'm Forest": 'Nottingham Forest',
+    'Sheffield Wednesday': 'Sheffield Weds',
+    'Wolverhampton': 'Wolves',
+    'Tottenham Hotspur': 'Tottenham',
+    'Spurs': 'Tottenham',
+    'Brighton & Hove Albion': 'Brighton',
+    'West Bromwich': 'West Brom',
+    'Queens Park Rangers': 'QPR',
+    'Atletico Madrid': 'Ath Madrid',
+    'Athletic Bilbao': 'Ath Bilbao',
+    'Paris Saint-Germain': 'Paris SG',
+    'PSG': 'Paris SG',
+    'Inter Milan': 'Inter',
+    'AC Milan': 'Milan',
+    'Bayern München': 'Bayern Munich',
+    'St Patricks': 'St. Patricks',
+    "St Patrick's Athletic": 'St. Patricks',
+}
+
+
+def team_key(name):
+    # име за сравнение: без интервалите в краищата и двойните вътре, малки букви
+    return ' '.join(str(name).split()).lower()
+
+
+def search_key(name):
+    # ключ за търсене: team_key без диакритики и препинателни знаци ("St. Patricks" -> "st patricks")
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return team_key(text)
+
+
+class TeamRegistry:
+    """
+    Речник на отборите: всяко име се нормализира веднъж (интервали, главни букви,
+    псевдоними) и получава цяло число - id. HomeTeam/AwayTeam се пазят като
+    категории с кодове = id, така че филтрите по отбор сравняват цели числа.
+
+    Регистърът не се променя на място: with_names() връща нов, в който старите
+    id-та са същите, а новите отбори са добавени накрая.
+    """
+
+    def __init__(self, names=(), aliases=None):
+        # нормализиран псевдоним -> показваното име на отбора
+        self.aliases = {team_key(alias): target
+                        for alias, target in (TEAM_ALIASES if aliases is None else aliases).items()}
+        self.names = []  # id -> показвано име
+        self.ids = {}    # нормализирано име -> id
+        for name in names:
+            self._add(name)
+        self.dtype = pd.CategoricalDtype(self.names)
+
+    def _resolve(self, name):
+        # (нормализиран ключ, показвано име); псевдонимът води до името в данните
+        display = ' '.join(str(name).split())
+        display = self.aliases.get(display.lower(), display)
+        return team_key(display), display
+
+    def _add(self, name):
+        if name is None or (not isinstance(name, str) and pd.isna(name)):
+            return
+        key, display = self._resolve(name)
+        if key not in self.ids:
+            self.ids[key] = len(self.names)
+            self.names.append(display)
+
+    def with_names(self, names):
+        """
+        Регистър с добавени непознати имена (или същият, ако всички са познати).
+        """
+        new = [name for name in pd.unique(pd.Series(names, dtype=object).dropna())
+               if self._resolve(name)[0] not in self.ids]
+        if not new:
+            return self
+        registry = TeamRegistry(self.names, {})
+        registry.aliases = self.aliases
+        for name in new:
+            registry._add(name)
+        registry.dtype = pd.CategoricalDtype(registry.names)
+        return registry
+
+    def id_of(self, name):
+        # id на отбора или None за непознат
+        return self.ids.get(self._resolve(name)[0])
+
+    def name_of(self, team_id):
+        return self.names[team_id]
+
+    def canonical(self, name):
+        """
+        Името на отбора, както е в данните; непознатото име се връща само почистено.
+        """
+        key, display = self._resolve(name)
+        team_id = self.ids.get(key)
+        return self.names[team_id] if team_id is not None else display
+
+    def codes(self, values):
+        # масив с id-та (-1 за празно/непознато); всяко различно име се нормализира веднъж
+        inverse, uniques = pd.factorize(pd.Series(values).astype(object))
+        lookup = np.array([self.ids.get(self._resolve(name)[0], -1) for name in uniques] + [-1], dtype=np.int32)
+        return lookup[inverse]
+
+    def categorical(self, values):
+        # колона с отбори -> категория с кодове = id
+        return pd.Categorical.from_codes(self.codes(values), dtype=self.dtype)
+
+
+# минимално сходство (difflib) за близко име при търсене с грешно изписване
+FUZZY_CUTOFF = 0.75
+
+
+class TeamSearch:
+    """
+    Индекс за търсене на отбор по част от името: сортирани ключове на пълните
+    имена (и псевдонимите) и на всяка дума от тях. Префикс е двоично търсене;
+    без нито едно съвпадение се търсят близки имена (difflib).
+    """
+
+    def __init__(self, teams, aliases=None, leagues=None):
+        self.teams = list(teams)
+        # отбор -> лигите, в които има мачове (за филтъра по лига)
+        self.leagues = leagues or {}
+        ids = {name: i for i, name in enumerate(self.teams)}
+        names = [(search_key(name), i) for i, name in enumerate(self.teams)]
+        names += [(search_key(alias), ids[target]) for alias, target in (aliases or {}).items() if target in ids]
+        words = [(word, i) for key, i in names for word in key.split()[1:]]
+        self.names = sorted(set(names))
+        self.words = sorted(set(words))
+        self._name_keys = [key for key, _ in self.names]
+        self._word_keys = [key for key, _ in self.words]
+
+    @staticmethod
+    def _prefixed(entries, keys, prefix):
+        start = bisect.bisect_left(keys, prefix)
+        stop = bisect.bisect_left(keys, prefix + '\uffff')
+        return [i for _, i in entries[start:stop]]
+
+    def search(self, query, league=None, limit=30, offset=0):
+        """
+        Отборите, чието име (или дума от него, или псевдоним) започва с `query`,
+        иначе близките по изписване; с `league` - само отборите с мачове в
+        тази лига. Връща (имена[offset:offset + limit], има ли още).
+        """
+        key = search_key(query or '')
+        if not key:
+            ranked = range(len(self.teams))
+        else:
+            ranked = (sorted(set(self._prefixed(self.names, self._name_keys, key)), key=self.teams.__getitem__)
+                      + sorted(set(self._prefixed(self.words, self._word_keys, key)), key=self.teams.__getitem__))
+            if not ranked and len(key) >= 3:
+                # няма префикс - вероятно грешно изписване
+                close = difflib.get_close_matches(key, self._name_keys, n=offset + limit, cutoff=FUZZY_CUTOFF)
+                ranked += [self.names[j][1] for name in close
+                           for j in range(bisect.bisect_left(self._name_keys, name),
+                                          bisect.bisect_right(self._name_keys, name))]
+        found, seen = [], set()
+        for i in ranked:
+            if i in seen:
+                continue
+            seen.add(i)
+            if league is None or league in self.leagues.get(self.teams[i], ()):
+                found.append(self.teams[i])
+                if len(found) > offset + limit:
+                    break
+        return found[offset:offset + limit], len(found) > offset + limit
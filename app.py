@@ -1,9 +1,61 @@
-from flask import Flask, render_template, request
+import json
+import math
+import os
+import time
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 from analyzers import analyzer_1x2
-from analyzers.data import teams
+from analyzers.batch import predict_batch, batch_records, MODELS
+from analyzers.scanner import scan
+from analyzers.prediction_cache import cached_run, prediction_cache
+from analyzers.report import ANALYZERS, iter_report, run_report
+from analyzers.data import current, dataset, start_refresher, ingest_results
+from analyzers import dixon_coles, metrics
 
 app = Flask(__name__)
 
+
+def start_background_refresh():
+    """
+    Фоново презареждане на data/ без рестарт на worker-ите (DATA_REFRESH_INTERVAL,
+    0 = изключено); Dixon–Coles таблиците се префитват там, а не в заявките.
+    Не тръгва при import: gunicorn.conf.py го вика във всеки worker (и при LAZY_START=1).
+    """
+    return start_refresher(int(os.environ.get("DATA_REFRESH_INTERVAL", 60)), on_refresh=dixon_coles.refit)
+
+
+def warm_up():
+    """
+    Зарежда данните и модулите, които се импортират при първа употреба (scipy),
+    преди първата заявка. gunicorn.conf.py го вика във всеки worker; при
+    LAZY_START=1 това се пропуска и ги плаща първата заявка.
+    """
+    snapshot = dataset.warm_up()
+    dixon_coles.model()  # таблиците от preload - зареждат се, не се фитват
+    snapshot.h2h  # индексът на директните срещи (иначе се строи при първата прогноза)
+    league = snapshot.leagues[snapshot.default_league]
+    if len(league.teams) >= 2:
+        run_report(league.teams[0], league.teams[1])
+
+# --- Време на заявките (+ cProfile за бавните при PROFILE_SLOW_MS) ---
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = metrics.start_profile()
+
+
+@app.teardown_request
+def record_timing(exc=None):
+    start = g.pop("request_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "unknown"
+    metrics.observe("football_request_seconds", endpoint, elapsed)
+    path = metrics.finish_profile(g.pop("profiler", None), endpoint, elapsed)
+    if path:
+        print(f"🐢 Бавна заявка {request.path} ({elapsed*1000:.0f} ms), профил: {path}")
+
+
 # --- Basic Auth ---
 USERS = {"client1": "password1", "client2": "password2"}
 
@@ -23,6 +75,43 @@ def require_auth():
         return authenticate()
 
 
+def verdict(home, away, prob_home, prob_draw, prob_away, chance):
+    """
+    Прогнозата като текст и шансът за успех; вероятностите са в проценти.
+    """
+    probs = [prob_home, prob_draw, prob_away]
+
+    # Изчисляваме максимална, средна и минимална вероятност
+    max_prob = max(probs)
+    min_prob = min(probs)
+    second_prob = sorted(probs, reverse=True)[1]
+
+    outcomes = [("Домакин", prob_home), ("Равенство", prob_draw), ("Гост", prob_away)]
+    outcomes_sorted = sorted(outcomes, key=lambda x: x[1], reverse=True)
+
+    # 1️⃣ Твърде рисков за залог
+    if max_prob - min_prob <= 10 and max_prob < 50:
+        return "Твърде рисков за залог", 2
+
+    # 2️⃣ Двоен шанс
+    if max_prob - second_prob <= 15:
+        top_names = [x[0] for x in outcomes_sorted[:2]]
+        if "Домакин" in top_names and "Равенство" in top_names:
+            return f"Двоен шанс 1X ({home} или Равен)", chance
+        if "Гост" in top_names and "Равенство" in top_names:
+            return f"Двоен шанс X2 (Равен или {away})", chance
+        if "Домакин" in top_names and "Гост" in top_names:
+            return f"Двоен шанс 12 ({home} или {away})", chance
+        return f"{home} победа", chance
+
+    # 3️⃣ Най-високата вероятност
+    if outcomes_sorted[0][0] == "Домакин":
+        return f"{home} победа", chance
+    if outcomes_sorted[0][0] == "Гост":
+        return f"{away} победа", chance
+    return "Равенство", chance
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     result = None
@@ -37,7 +126,7 @@ def index():
 
         if selected_home and selected_away and selected_home != selected_away:
             # Взимаме анализа
-            html_result, probs, chance_score = analyzer_1x2.run(selected_home, selected_away)
+            html_result, probs, chance_score = cached_run("1x2", analyzer_1x2.run, selected_home, selected_away)
             result = html_result
             prob_home, prob_draw, prob_away = probs
             chance = chance_score
@@ -48,57 +137,233 @@ def index():
                 prob_draw *= 100
                 prob_away *= 100
 
-            probs = [prob_home, prob_draw, prob_away]
-
-            # Изчисляваме максимална, средна и минимална вероятност
-            max_prob = max(probs)
-            min_prob = min(probs)
-            second_prob = sorted(probs, reverse=True)[1]
-
-            outcomes = [("Домакин", prob_home), ("Равенство", prob_draw), ("Гост", prob_away)]
-            outcomes_sorted = sorted(outcomes, key=lambda x: x[1], reverse=True)
-
-            # 1️⃣ Твърде рисков за залог
-            if max_prob - min_prob <= 10 and max_prob < 50:
-                predicted_result = "Твърде рисков за залог"
-                chance = 2
-
-            # 2️⃣ Двоен шанс
-            elif max_prob - second_prob <= 15:
-                top_two = outcomes_sorted[:2]
-                top_names = [x[0] for x in top_two]
-
-                if "Домакин" in top_names and "Равенство" in top_names:
-                    predicted_result = f"Двоен шанс 1X ({selected_home} или Равен)"
-                elif "Гост" in top_names and "Равенство" in top_names:
-                    predicted_result = f"Двоен шанс X2 (Равен или {selected_away})"
-                elif "Домакин" in top_names and "Гост" in top_names:
-                    predicted_result = f"Двоен шанс 12 ({selected_home} или {selected_away})"
-                else:
-                    predicted_result = f"{selected_home} победа"
-
-            # 3️⃣ Най-високата вероятност
-            else:
-                if outcomes_sorted[0][0] == "Домакин":
-                    predicted_result = f"{selected_home} победа"
-                elif outcomes_sorted[0][0] == "Гост":
-                    predicted_result = f"{selected_away} победа"
-                else:
-                    predicted_result = "Равенство"
-
-    return render_template(
-        "index.html",
-        teams=teams,
-        result=result,
-        selected_home=selected_home,
-        selected_away=selected_away,
-        prob_home=prob_home,
-        prob_draw=prob_draw,
-        prob_away=prob_away,
-        chance=chance,
-        predicted_result=predicted_result
-    )
+            predicted_result, chance = verdict(selected_home, selected_away, prob_home, prob_draw, prob_away, chance)
+
+    with metrics.span("render_template"):
+        return render_template(
+            "index.html",
+            leagues=sorted(current().leagues),
+            result=result,
+            selected_home=selected_home,
+            selected_away=selected_away,
+            prob_home=prob_home,
+            prob_draw=prob_draw,
+            prob_away=prob_away,
+            chance=chance,
+            predicted_result=predicted_result
+        )
+
+
+# --- Търсене на отбор (select2 AJAX): префикс/близко име, по желание в една лига ---
+TEAM_SEARCH_LIMIT = 30
+
+@app.route("/api/teams")
+def api_teams():
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        limit = min(100, max(1, int(request.args.get("limit", TEAM_SEARCH_LIMIT))))
+    except ValueError:
+        return jsonify({"error": "page и limit трябва да са цели числа"}), 400
+    snapshot = current()
+    league = request.args.get("league") or None
+    if league is not None and league not in snapshot.leagues:
+        return jsonify({"error": f"Непозната лига '{league}'"}), 400
+    teams, more = snapshot.team_search.search(request.args.get("q", ""), league, limit, (page - 1) * limit)
+    # форматът, който select2 очаква директно
+    return jsonify({"results": [{"id": team, "text": team, "league": snapshot.team_league.get(team)}
+                                for team in teams],
+                    "pagination": {"more": more}})
+
+
+# --- Поточно изпращане на анализите (Server-Sent Events) ---
+@app.route("/stream")
+def stream():
+    home = request.args.get("home")
+    away = request.args.get("away")
+    if not home or not away or home == away:
+        return jsonify({"error": "Моля, избери два различни отбора."}), 400
+    skip = set(filter(None, request.args.get("skip", "").split(",")))
+
+    def events():
+        for item in iter_report(home, away, skip=skip):
+            yield f"event: result\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --- Пълен отчет от всички анализатори (JSON) ---
+@app.route("/api/report")
+def api_report():
+    home = request.args.get("home")
+    away = request.args.get("away")
+    if not home or not away or home == away:
+        return jsonify({"error": "Моля, избери два различни отбора."}), 400
+    return jsonify(run_report(home, away))
+
+
+# --- Прогноза като JSON (без HTML): вероятности и λ от анализаторите ---
+def _json_safe(value):
+    # NaN/inf не са валиден JSON -> None
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def predict(home, away, markets=None):
+    """
+    Прогнозата за един мач като речник: 1X2, λ, прогнозата като текст,
+    директните срещи (последните 5 и корекцията от тях) и резултатите на
+    останалите анализатори (`markets`, по подразбиране всички).
+    """
+    keys = [key for key, _, _ in ANALYZERS]
+    skip = set(keys) - set(markets or keys) - {"1x2"}
+    report = run_report(home, away, skip=skip, html=False)
+    results = {item["key"]: item for item in report["analyzers"]}
+    main = results["1x2"]["data"] or {}
+    prediction = {"home": home, "away": away}
+    if main:
+        prediction.update({k: main[k] for k in ("league", "lambda_home", "lambda_away",
+                                                "prob_home", "prob_draw", "prob_away")})
+        prediction["verdict"], prediction["chance"] = verdict(
+            home, away, main["prob_home"] * 100, main["prob_draw"] * 100, main["prob_away"] * 100, main["chance"])
+    snapshot = current()
+    stats = snapshot.head_to_head(home, away)
+    prediction["h2h"] = None if stats is None else {
+        "matches": stats.matches, "goals_per_match": stats.goals_per_match, "btts_rate": stats.btts_rate,
+        "adjustment": list(snapshot.h2h.adjustment(home, away)),
+    }
+    prediction["markets"] = {
+        key: ({k: v for k, v in item["data"].items() if k not in ("home", "away")}
+              if item["data"] is not None else {"error": item["error"]})
+        for key, item in results.items() if key != "1x2"
+    }
+    return _json_safe(prediction)
+
+
+def invalid_fixture(fixtures):
+    """
+    Индексът на първия мач в списъка, който не е {"home": ..., "away": ...} с
+    два различни отбора; None, ако всички са наред.
+    """
+    for i, fixture in enumerate(fixtures):
+        if not isinstance(fixture, dict):
+            return i
+        home, away = fixture.get("home"), fixture.get("away")
+        if not home or not away or home == away:
+            return i
+    return None
+
+
+@app.route("/api/predict", methods=["GET", "POST"])
+def api_predict():
+    payload = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    markets = payload.get("markets")
+    if isinstance(markets, str):
+        markets = [m for m in markets.split(",") if m]
+    if "fixtures" in payload:
+        fixtures = payload.get("fixtures")
+        if not isinstance(fixtures, list):
+            return jsonify({"error": "Очаква се JSON с поле 'fixtures': [{\"home\": ..., \"away\": ...}]"}), 400
+        bad = invalid_fixture(fixtures)
+        if bad is not None:
+            return jsonify({"error": f"Мач #{bad}: моля, избери два различни отбора.", "index": bad}), 400
+        return jsonify({"predictions": [predict(f["home"], f["away"], markets) for f in fixtures]})
+    home, away = payload.get("home"), payload.get("away")
+    if not home or not away or home == away:
+        return jsonify({"error": "Моля, избери два различни отбора."}), 400
+    return jsonify(predict(home, away, markets))
+
+
+# --- Пакетна прогноза за списък мачове (JSON) ---
+@app.route("/api/batch", methods=["POST"])
+def api_batch():
+    payload = request.get_json(silent=True) or {}
+    fixtures = payload.get("fixtures")
+    if not isinstance(fixtures, list):
+        return jsonify({"error": "Очаква се JSON с поле 'fixtures': [{\"home\": ..., \"away\": ...}]"}), 400
+    model = payload.get("model", "form")
+    if model not in MODELS:
+        return jsonify({"error": f"Непознат модел '{model}' (възможни: {', '.join(MODELS)})"}), 400
+    bad = invalid_fixture(fixtures)
+    if bad is not None:
+        return jsonify({"error": f"Мач #{bad}: моля, избери два различни отбора.", "index": bad}), 400
+    return jsonify({"predictions": batch_records(fixtures, predict_batch(fixtures, model=model))})
+
+
+# --- Value bets за всички мачове в корпуса, подредени по edge ---
+@app.route("/api/value-bets")
+def api_value_bets():
+    try:
+        min_edge = float(request.args.get("min_edge", 0.05))
+        top = int(request.args.get("top", 100))
+    except ValueError:
+        return jsonify({"error": "min_edge и top трябва да са числа"}), 400
+    table = scan(min_edge=min_edge).head(top)
+    table["Date"] = table["Date"].astype(str)
+    return jsonify({"value_bets": table.to_dict(orient="records")})
+
+
+# --- Live резултати: обновяват формата на двата отбора без презареждане ---
+@app.route("/api/results", methods=["POST"])
+def api_results():
+    payload = request.get_json(silent=True) or {}
+    results = payload.get("results", [payload] if payload else None)
+    if not isinstance(results, list):
+        return jsonify({"error": "Очаква се JSON с поле 'results': [{\"home\", \"away\", \"fthg\", \"ftag\", \"date\"}]"}), 400
+    # първо се проверява целият списък - невалиден запис не оставя половин добавени резултати
+    parsed = []
+    for i, r in enumerate(results):
+        try:
+            home, away = r["home"], r["away"]
+            if not isinstance(home, str) or not isinstance(away, str) or not home or not away:
+                raise TypeError(home, away)
+            fthg, ftag = int(r["fthg"]), int(r["ftag"])
+            if fthg < 0 or ftag < 0:
+                raise ValueError(fthg, ftag)
+            parsed.append((home, away, fthg, ftag, r.get("date")))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": f"Невалиден резултат #{i}: {r}", "index": i}), 400
+    try:
+        ingested = ingest_results(parsed)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"ingested": ingested, "fingerprint": current().fingerprint})
+
+
+# --- Статистика на кеша с прогнози (за оразмеряване) ---
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+
+# --- Заредените данни: мачове по лиги и обединените дубликати между файловете ---
+@app.route("/data/stats")
+def data_stats():
+    snapshot = current()
+    return jsonify({
+        "fingerprint": snapshot.fingerprint,
+        "leagues": {name: len(league.data) for name, league in snapshot.leagues.items()},
+        "duplicates": snapshot.duplicates,
+    })
+
+
+# --- Prometheus метрики: хистограми на участъците и заявките + броячите на кеша ---
+@app.route("/metrics")
+def metrics_endpoint():
+    stats = prediction_cache.stats()
+    lines = [metrics.render()]
+    for name in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        lines.append(f"# TYPE football_prediction_cache_{name}_total counter\n"
+                     f"football_prediction_cache_{name}_total {stats[name]}\n")
+    return Response("".join(lines), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
+    start_background_refresh()
     app.run(debug=True, port=8080)
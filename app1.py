@@ -1,30 +1,35 @@
 from flask import Flask, render_template, request
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
 import glob
+from analyzers.cache import load_csv_cached
+from analyzers.h2h import H2HIndex
+from analyzers.score_matrix import score_matrix, outcome_probs, over_probs, most_likely_score
 
 app = Flask(__name__)
 
 # === Зареждане на CSV файловете ===
 csv_files = glob.glob("data/*.csv")
-dfs = []
-for file in csv_files:
+
+def read_csv_file(file):
     try:
         df = pd.read_csv(file)
         if all(col in df.columns for col in ['HomeTeam', 'AwayTeam', 'FTHG', 'FTAG']):
-            dfs.append(df)
             print(f"✅ Зареден файл: {file} ({len(df)} реда)")
-        else:
-            print(f"⚠️ Пропуснат файл (липсваща колона): {file}")
+            return df
+        print(f"⚠️ Пропуснат файл (липсваща колона): {file}")
     except Exception as e:
         print(f"❌ Грешка при зареждане на {file}: {e}")
+    return None
 
-if len(dfs) == 0:
-    raise Exception("❌ Няма намерени валидни CSV файлове в папката!")
+# Парсваме само нови/променени файлове; останалото идва от data/.cache
+data = load_csv_cached(csv_files, read_csv_file, name='app1')
 
-data = pd.concat(dfs, ignore_index=True)
+if data is None:
+    raise Exception("❌ Няма намерени валидни CSV файлове в папката!")
 teams = sorted(set(data['HomeTeam']).union(data['AwayTeam']))
+# Директните срещи по двойка отбори (с агрегатите на последните 5) - изграждат се веднъж
+h2h = H2HIndex.from_frame(data)
 
 # === Функция за експоненциални тежести на последните мачове ===
 def weighted_stats_exp(df, team, is_home, last_matches=10):
@@ -44,16 +49,15 @@ def weighted_stats_exp(df, team, is_home, last_matches=10):
 
 # === Функция за история на директните срещи (H2H) ===
 def h2h_adjustment(home, away, last_h2h=5):
-    df_h2h = data[((data["HomeTeam"] == home) & (data["AwayTeam"] == away)) |
-                  ((data["HomeTeam"] == away) & (data["AwayTeam"] == home))]
-    if len(df_h2h) == 0:
+    stats = h2h.stats(home, away, last_h2h)
+    if stats is None:
         return 1.0  # няма корекция
-    df_h2h = df_h2h.tail(last_h2h)
-    home_adv = 1 + (df_h2h['FTHG'][df_h2h['HomeTeam'] == home].sum() - df_h2h['FTAG'][df_h2h['HomeTeam'] == home].sum())*0.05
+    _, goal_diff = stats.as_host(home)
+    home_adv = 1 + goal_diff*0.05
     return max(0.8, min(home_adv, 1.2))  # ограничаваме корекцията
 
-# === Предсказване на мач с Poisson и Monte Carlo симулация ===
-def predict_match(home, away, simulations=10000):
+# === Предсказване на мач с точна Poisson матрица на резултатите ===
+def predict_match(home, away):
     if home == away:
         return "⚠️ Моля, избери два различни отбора."
 
@@ -77,56 +81,22 @@ def predict_match(home, away, simulations=10000):
     lambda_home = mean_home_goals * attack_strength_home * defense_strength_away * h2h_adjustment(home, away)
     lambda_away = mean_away_goals * attack_strength_away * defense_strength_home
 
-    # --- Monte Carlo симулация ---
-    home_wins = 0
-    draws = 0
-    away_wins = 0
-    over_1_5 = 0
-    over_2_5 = 0
-    over_3_5 = 0
-    most_common_score = {}
-
-    for _ in range(simulations):
-        goals_home = np.random.poisson(lambda_home)
-        goals_away = np.random.poisson(lambda_away)
-
-        # Победа/равенство
-        if goals_home > goals_away:
-            home_wins += 1
-        elif goals_home == goals_away:
-            draws += 1
-        else:
-            away_wins += 1
-
-        # Over/Under
-        total_goals = goals_home + goals_away
-        if total_goals > 1:
-            over_1_5 += 1
-        if total_goals > 2:
-            over_2_5 += 1
-        if total_goals > 3:
-            over_3_5 += 1
-
-        # Най-често срещан резултат
-        key = (goals_home, goals_away)
-        most_common_score[key] = most_common_score.get(key, 0) + 1
+    # --- Матрица на резултатите ---
+    m = score_matrix(lambda_home, lambda_away)
 
     # --- Вероятности ---
-    home_win_prob = home_wins / simulations
-    draw_prob = draws / simulations
-    away_win_prob = away_wins / simulations
-    over_1_5_prob = over_1_5 / simulations
-    over_2_5_prob = over_2_5 / simulations
-    over_3_5_prob = over_3_5 / simulations
+    home_win_prob, draw_prob, away_win_prob = outcome_probs(m)
+    overs = over_probs(m, (1.5, 2.5, 3.5))
+    over_1_5_prob, over_2_5_prob, over_3_5_prob = overs[1.5], overs[2.5], overs[3.5]
 
     # Най-вероятен резултат
-    most_likely_score = max(most_common_score, key=most_common_score.get)
+    best_score, _ = most_likely_score(m)
 
     # --- HTML резултат ---
     return f"""
     <div class='result-box'>
       <h2>{home} 🆚 {away}</h2>
-      <p><b>Най-вероятен резултат:</b> {most_likely_score[0]} - {most_likely_score[1]}</p>
+      <p><b>Най-вероятен резултат:</b> {best_score[0]} - {best_score[1]}</p>
       <div class='probabilities'>
         <p>🏠 Победа за {home}: <b>{home_win_prob*100:.1f}%</b></p>
         <p>🤝 Равенство: <b>{draw_prob*100:.1f}%</b></p>
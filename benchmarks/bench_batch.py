@@ -0,0 +1,42 @@
+"""
+Пакетна прогноза срещу analyzer_1x2.run() в цикъл.
+
+Стартиране от корена на проекта:
+    python -m benchmarks.bench_batch [брой_мачове]
+"""
+import sys
+import time
+import numpy as np
+from analyzers import analyzer_1x2
+from analyzers.batch import predict_batch
+from analyzers.data import current
+
+
+def random_fixtures(n, seed=42):
+    teams = current().teams
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(len(teams), size=(n, 2))
+    return [{'home': teams[h], 'away': teams[a]} for h, a in pairs if h != a]
+
+
+def main(n=500):
+    fixtures = random_fixtures(n)
+    n = len(fixtures)
+
+    start = time.perf_counter()
+    for f in fixtures:
+        analyzer_1x2.run(f['home'], f['away'])
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict_batch(fixtures)
+    batch_s = time.perf_counter() - start
+
+    print(f"мачове: {n}")
+    print(f"run() в цикъл:  {loop_s*1000:8.1f} ms  ({n/loop_s:10.0f} мача/s)")
+    print(f"predict_batch:  {batch_s*1000:8.1f} ms  ({n/batch_s:10.0f} мача/s)")
+    print(f"ускорение:      {loop_s/batch_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,98 @@
+"""
+Бюджети за студен старт на worker: `import app` в нов интерпретатор не трябва
+да зарежда данните, нито scipy (те идват при warm_up() или при първата заявка),
+и трябва да се вмести в бюджетите по-долу. Времената по модули са от
+python -X importtime; warm_up() се мери отделно.
+
+Стартиране от корена на проекта:
+    python -m benchmarks.startup                # таблица; код за изход 1 при превишен бюджет
+    python -m benchmarks.startup --top 25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# кумулативно време за import (ms) - с резерв за по-бавна машина
+IMPORT_BUDGETS_MS = {
+    'app': 1000,
+    'analyzers.data': 600,
+    'analyzers.report': 150,
+    'analyzers.batch': 150,
+}
+WARM_UP_BUDGET_MS = 1500
+# модули, които не трябва да са заредени след `import app`
+LAZY_MODULES = ('scipy', 'scipy.stats', 'scipy.optimize', 'scipy.special')
+
+_PROBE = """
+import json, sys, time
+import app
+from analyzers.data import dataset
+state = {'loaded': dataset.loaded, 'modules': [m for m in %r if m in sys.modules]}
+start = time.perf_counter()
+app.warm_up()
+state['warm_up_ms'] = (time.perf_counter() - start) * 1000
+print(json.dumps(state))
+"""
+
+
+def _import_times(stderr):
+    # редовете "import time: self [us] | cumulative | package" -> {модул: кумулативно ms}
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.setdefault(name.strip(), int(cumulative) / 1000)
+    return times
+
+
+def measure():
+    env = dict(os.environ, DATA_REFRESH_INTERVAL='0', PREDICTION_CACHE_SIZE='0')
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE % (LAZY_MODULES,)],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"import app завърши с грешка:\n{out.stderr}")
+    state = json.loads(out.stdout.strip().splitlines()[-1])
+    return _import_times(out.stderr), state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бюджети за времето на import app")
+    parser.add_argument('--top', type=int, default=15, help="колко от най-бавните модули да се покажат")
+    args = parser.parse_args(argv)
+
+    times, state = measure()
+    failures = []
+    for name, budget in IMPORT_BUDGETS_MS.items():
+        spent = times.get(name)
+        flag = ''
+        if spent is not None and spent > budget:
+            flag = '  <-- над бюджета'
+            failures.append(name)
+        print(f"{name:<28}{spent if spent is not None else float('nan'):10.1f} ms  (бюджет {budget} ms){flag}")
+    if state['loaded']:
+        failures.append('data')
+        print("данните са заредени при import (трябва да се зареждат при warm_up/първа заявка)")
+    for name in state['modules']:
+        failures.append(name)
+        print(f"{name} е зареден при import")
+    warm_up = state['warm_up_ms']
+    if warm_up > WARM_UP_BUDGET_MS:
+        failures.append('warm_up')
+    print(f"{'warm_up()':<28}{warm_up:10.1f} ms  (бюджет {WARM_UP_BUDGET_MS} ms)"
+          f"{'  <-- над бюджета' if warm_up > WARM_UP_BUDGET_MS else ''}")
+
+    print("\nнай-бавни модули (кумулативно):")
+    for name, spent in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40}{spent:10.1f} ms")
+    if failures:
+        print(f"превишени бюджети: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
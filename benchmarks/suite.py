@@ -0,0 +1,299 @@
+"""
+Набор от бенчмаркове: import, зареждане на данните (warm_up), team_strength,
+всеки analyzers/*.run, value-bet сканиране и Flask route-овете "/" и
+"/api/predict" от край до край.
+
+Всяко измерване се пуска в отделен процес с фиксиран seed. Реалният data/ се
+копира в benchmarks/.corpus/x1 (студеното зареждане трие кеша само там, не
+data/.cache на приложението), до него се генерират синтетични корпуси 10x и
+100x, а резултатът е JSON, който може да се сравни със записан baseline.
+
+Стартиране от корена на проекта:
+    python -m benchmarks.suite                          # 1x и 10x, печата JSON
+    python -m benchmarks.suite --scales 1 10 100 --out results.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline          # презаписва benchmarks/baseline.json
+
+При --compare кодът за изход е 1, ако някое измерване е по-бавно от baseline
+с повече от --tolerance (по подразбиране 25%).
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', '.corpus')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+SEED = 42
+CORPUS_VERSION = 1
+
+# Анализаторите от analyzers/*.py в реда на отчета
+ANALYZERS = ['1x2', 'goals', 'btts', 'corners', 'cards', 'handicap', 'valuebets']
+
+
+# --- Синтетични корпуси ---
+
+def build_corpus(scale, seed=SEED):
+    """
+    data/ x `scale`: всеки реален файл се повтаря `scale` пъти; копие i > 0 е със
+    собствени отбори ("<отбор> #i") и голове, изтеглени от Poisson със средните
+    на файла; при scale=1 файловете се копират без промяна. Връща директорията,
+    в която има data/.
+    """
+    target = os.path.join(CORPUS_DIR, f'x{scale}')
+    marker = os.path.join(target, 'corpus.json')
+    sources = sorted(glob.glob(os.path.join(ROOT, 'data', '*.csv')))
+    spec = {'version': CORPUS_VERSION, 'scale': scale, 'seed': seed,
+            'sources': [[os.path.basename(p), os.path.getsize(p)] for p in sources]}
+    try:
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f) == spec:
+                return target
+    except (OSError, ValueError):
+        pass
+
+    import pandas as pd
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(os.path.join(target, 'data'))
+    rng = np.random.default_rng(seed)
+    for path in sources:
+        if scale == 1:
+            shutil.copyfile(path, os.path.join(target, 'data', os.path.basename(path)))
+            continue
+        raw = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8')
+        copies = [raw]
+        for i in range(1, scale):
+            copy = raw.copy()
+            for col in ('HomeTeam', 'AwayTeam'):
+                copy[col] = copy[col] + f' #{i}'
+            for col in ('FTHG', 'FTAG'):
+                goals = pd.to_numeric(copy[col], errors='coerce')
+                copy[col] = rng.poisson(goals.mean(), len(copy)).astype(str)
+            copies.append(copy)
+        pd.concat(copies, ignore_index=True).to_csv(
+            os.path.join(target, 'data', os.path.basename(path)), index=False, encoding='utf-8')
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+    return target
+
+
+# --- Измервания (изпълняват се в worker процеса) ---
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def _stats(times, calls=1):
+    # времената са в ms за едно извикване на fn (или за `calls` операции)
+    per_call = [t / calls for t in times]
+    return {'median_ms': statistics.median(per_call), 'min_ms': min(per_call),
+            'mean_ms': statistics.fmean(per_call), 'repeat': len(times), 'calls': calls}
+
+
+def _fixtures(teams, n, seed):
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(len(teams), size=(n * 2, 2))
+    return [(teams[h], teams[a]) for h, a in pairs if h != a][:n]
+
+
+def bench_import():
+    results = {}
+    start = time.perf_counter()
+    import analyzers.data  # noqa: F401
+    results['import_data'] = _stats([(time.perf_counter() - start) * 1000])
+    start = time.perf_counter()
+    import app
+    results['import_app'] = _stats([(time.perf_counter() - start) * 1000])
+    # данните се зареждат лениво - отделно измерване на зареждането (+ първия отчет)
+    start = time.perf_counter()
+    app.warm_up()
+    results['warm_up'] = _stats([(time.perf_counter() - start) * 1000])
+    return results
+
+
+def bench_hot(seed, repeat):
+    from analyzers import (analyzer_1x2, analyzer_goals, analyzer_btts, analyzer_corners,
+                           analyzer_cards, analyzer_handicap, analyzer_valuebets)
+    from analyzers import scanner
+    from analyzers.data import current, team_strength
+    import app as web
+
+    snapshot = current()
+    results = {}
+    fixtures = _fixtures(snapshot.teams, 200, seed)
+
+    def strengths():
+        for home, away in fixtures:
+            team_strength(home, True)
+            team_strength(away, False)
+    results['team_strength'] = _stats(_timed(strengths, repeat), calls=2 * len(fixtures))
+
+    runs = {
+        '1x2': analyzer_1x2.run,
+        'goals': analyzer_goals.run,
+        'btts': analyzer_btts.run,
+        'corners': analyzer_corners.run,
+        'cards': analyzer_cards.run,
+        'handicap': analyzer_handicap.run,
+        'valuebets': lambda home, away: analyzer_valuebets.run(home, away, current().league_for(home, away).data),
+    }
+    sample = fixtures[:20]
+    for name in ANALYZERS:
+        run = runs[name]
+
+        def all_fixtures(run=run):
+            for home, away in sample:
+                run(home, away)
+        np.random.seed(seed)
+        results[f'analyzer.{name}'] = _stats(_timed(all_fixtures, repeat), calls=len(sample))
+
+    # value-bet сканиране (scanner.scan): изиграните мачове от корпуса (реални двойки с коефициенти)
+    data = snapshot.data
+    rows = np.random.default_rng(seed).choice(len(data), size=min(50, len(data)), replace=False)
+    played = data.iloc[rows]
+    results['valuebets_scan'] = _stats(_timed(lambda: scanner.scan(played), repeat), calls=len(played))
+
+    # целият корпус както в /api/valuebets; λ без поглед напред се смятат веднъж, преди измерването
+    corpus = scanner.corpus_fixtures(snapshot)[0]
+    results['valuebets_scan_corpus'] = _stats(_timed(scanner.scan, repeat), calls=len(corpus))
+
+    # Flask "/" от край до край (auth, анализ, шаблон); кешът с прогнози е изключен от worker-а
+    client = web.app.test_client()
+    user, password = next(iter(web.USERS.items()))
+    headers = {'Authorization': 'Basic ' + base64.b64encode(f'{user}:{password}'.encode()).decode()}
+    results['flask_index_get'] = _stats(_timed(lambda: client.get('/', headers=headers), repeat))
+
+    def post():
+        for home, away in sample[:5]:
+            response = client.post('/', data={'home_team': home, 'away_team': away}, headers=headers)
+            assert response.status_code == 200, response.status_code
+    results['flask_index_post'] = _stats(_timed(post, repeat), calls=5)
+
+    # същата прогноза като JSON (без шаблона): сравнима с flask_index_post
+    def api():
+        for home, away in sample[:5]:
+            response = client.get('/api/predict', query_string={'home': home, 'away': away, 'markets': '1x2'},
+                                  headers=headers)
+            assert response.status_code == 200, response.status_code
+    results['flask_api_predict'] = _stats(_timed(api, repeat), calls=5)
+    return results
+
+
+def worker(phase, seed, repeat):
+    np.random.seed(seed)
+    results = bench_import()
+    if phase == 'all':
+        results.update(bench_hot(seed, repeat))
+    json.dump(results, sys.stdout)
+
+
+# --- Оркестрация ---
+
+def _run_worker(cwd, phase, seed, repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''),
+               DATA_REFRESH_INTERVAL='0', PREDICTION_CACHE_SIZE='0', PYTHONHASHSEED=str(seed))
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--worker', phase,
+                          '--seed', str(seed), '--repeat', str(repeat)],
+                         cwd=cwd, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"worker ({cwd}) завърши с грешка:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_suite(scales, seed=SEED, repeat=5):
+    results = {}
+    for scale in scales:
+        cwd = build_corpus(scale, seed)
+        # студено зареждане: без колонковия кеш (data/.cache), в нов интерпретатор
+        shutil.rmtree(os.path.join(cwd, 'data', '.cache'), ignore_errors=True)
+        cold = _run_worker(cwd, 'import', seed, repeat)
+        warm = _run_worker(cwd, 'all', seed, repeat)
+        scale_results = {f'{name}_cold': value for name, value in cold.items()}
+        scale_results.update({f'{name}_warm' if name.startswith(('import_', 'warm_up')) else name: value
+                              for name, value in warm.items()})
+        results[f'x{scale}'] = scale_results
+        print(f"x{scale}: готово", file=sys.stderr)
+    return {
+        'meta': {
+            'seed': seed,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Сравнява медианите с baseline; връща списък (мащаб, измерване, baseline ms, сега ms, отношение)
+    и дали има регресия над `tolerance`.
+    """
+    rows = []
+    regressed = False
+    for scale, benches in report['results'].items():
+        for name, value in benches.items():
+            base = baseline.get('results', {}).get(scale, {}).get(name)
+            if base is None:
+                continue
+            ratio = value['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+            rows.append((scale, name, base['median_ms'], value['median_ms'], ratio))
+            regressed = regressed or ratio > 1 + tolerance
+    return rows, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмаркове на football-analyzer")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help="JSON файл за резултатите (по подразбиране stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON baseline за сравнение")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true', help=f"записва резултата в {BASELINE}")
+    parser.add_argument('--worker', choices=['import', 'all'], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return worker(args.worker, args.seed, args.repeat)
+
+    report = run_suite(args.scales, args.seed, args.repeat)
+    text = json.dumps(report, indent=1, ensure_ascii=False)
+    if args.save_baseline:
+        args.out = BASELINE
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.tolerance)
+        for scale, name, base, now, ratio in rows:
+            flag = '  <-- регресия' if ratio > 1 + args.tolerance else ''
+            print(f"{scale:>5} {name:<24} {base:10.3f} ms -> {now:10.3f} ms  x{ratio:5.2f}{flag}",
+                  file=sys.stderr)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ import numpy as np
 from scipy.stats import poisson
 import glob
 import os
+import sys
+
+# индексът на директните срещи е общ с приложението в корена (analyzers/h2h.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyzers.h2h import H2HIndex
 
 app = Flask(__name__)
 
@@ -53,20 +58,22 @@ def team_strength(team, is_home, last_matches=10):
     return attack, defense
 
 # --- H2H корекция ---
+# Директните срещи по двойка отбори се индексират веднъж; корекцията е lookup
+h2h = H2HIndex.from_frame(data)
+
 def h2h_correction(home, away, max_adjust=0.2):
-    df_h2h = data[((data["HomeTeam"]==home)&(data["AwayTeam"]==away)) |
-                  ((data["HomeTeam"]==away)&(data["AwayTeam"]==home))]
-    if len(df_h2h)==0:
-        return 1.0,1.0
-    df_h2h = df_h2h.tail(5)
-    home_scores = df_h2h[(df_h2h['HomeTeam']==home)]['FTHG'].mean() - df_h2h[(df_h2h['HomeTeam']==home)]['FTAG'].mean()
-    away_scores = df_h2h[(df_h2h['HomeTeam']==away)]['FTHG'].mean() - df_h2h[(df_h2h['HomeTeam']==away)]['FTAG'].mean()
-    home_corr = 1 + np.clip(home_scores*0.05, -max_adjust, max_adjust)
-    away_corr = 1 + np.clip(away_scores*0.05, -max_adjust, max_adjust)
-    return home_corr, away_corr
+    # по отбор: 1 + 0.05 x средната голова разлика като домакин в последните 5 срещи;
+    # 1.0, ако не е бил домакин на другия
+    return h2h.adjustment(home, away, per_goal=0.05, max_adjust=max_adjust)
+
+# --- Точна матрица на резултатите (Poisson) ---
+def score_matrix(lambda_home, lambda_away, max_goals=15):
+    goals = np.arange(max_goals + 1)
+    m = np.outer(poisson.pmf(goals, lambda_home), poisson.pmf(goals, lambda_away))
+    return m / m.sum()
 
 # --- Основна прогноза ---
-def predict_match(home, away, simulations=3000):
+def predict_match(home, away):
     if home == away:
         return "⚠️ Моля, избери два различни отбора."
 
@@ -82,8 +89,6 @@ def predict_match(home, away, simulations=3000):
 
     # --- H2H ---
     home_corr, away_corr = h2h_correction(home, away)
-    home_corr = 1 if np.isnan(home_corr) else home_corr
-    away_corr = 1 if np.isnan(away_corr) else away_corr
 
     # --- Лямбда за Poisson ---
     lambda_home = mean_home_goals * (home_attack / away_defense) * home_corr
@@ -91,31 +96,13 @@ def predict_match(home, away, simulations=3000):
     lambda_home = np.clip(lambda_home, 0.2, 4.5)
     lambda_away = np.clip(lambda_away, 0.2, 4.5)
 
-    # --- Симулации за победа/равенство/загуба и BTTS ---
-    home_wins = draws = away_wins = btts = 0
-    score_counter = {}
-
-    for _ in range(simulations):
-        gh = np.random.poisson(lambda_home)
-        ga = np.random.poisson(lambda_away)
-
-        if gh > ga:
-            home_wins += 1
-        elif gh == ga:
-            draws += 1
-        else:
-            away_wins += 1
-
-        if gh > 0 and ga > 0:
-            btts += 1
-
-        score_counter[(gh, ga)] = score_counter.get((gh, ga), 0) + 1
-
-    home_win_prob = home_wins / simulations * 100
-    draw_prob = draws / simulations * 100
-    away_win_prob = away_wins / simulations * 100
-    btts_prob = btts / simulations * 100
-    most_likely_score = max(score_counter, key=score_counter.get)
+    # --- Победа/равенство/загуба и BTTS от матрицата ---
+    m = score_matrix(lambda_home, lambda_away)
+    home_win_prob = np.tril(m, -1).sum() * 100
+    draw_prob = np.trace(m) * 100
+    away_win_prob = np.triu(m, 1).sum() * 100
+    btts_prob = m[1:, 1:].sum() * 100
+    most_likely_score = np.unravel_index(np.argmax(m), m.shape)
 
     # --- Over/Under общи голове ---
     lambda_total = lambda_home + lambda_away
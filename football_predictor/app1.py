@@ -1,8 +1,13 @@
 from flask import Flask, render_template, request
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
 import glob
+import os
+import sys
+
+# индексът на директните срещи е общ с приложението в корена (analyzers/h2h.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analyzers.h2h import H2HIndex
 
 app = Flask(__name__)
 
@@ -25,6 +30,8 @@ if len(dfs) == 0:
 
 data = pd.concat(dfs, ignore_index=True)
 teams = sorted(set(data['HomeTeam']).union(data['AwayTeam']))
+# Директните срещи по двойка отбори (с агрегатите на последните 5) - изграждат се веднъж
+h2h = H2HIndex.from_frame(data)
 
 # === Функция за експоненциални тежести на последните мачове ===
 def weighted_stats_exp(df, team, is_home, last_matches=10):
@@ -44,12 +51,11 @@ def weighted_stats_exp(df, team, is_home, last_matches=10):
 
 # === Функция за история на директните срещи (H2H) ===
 def h2h_adjustment(home, away, last_h2h=5):
-    df_h2h = data[((data["HomeTeam"] == home) & (data["AwayTeam"] == away)) |
-                  ((data["HomeTeam"] == away) & (data["AwayTeam"] == home))]
-    if len(df_h2h) == 0:
+    stats = h2h.stats(home, away, last_h2h)
+    if stats is None:
         return 1.0  # няма корекция
-    df_h2h = df_h2h.tail(last_h2h)
-    home_adv = 1 + (df_h2h['FTHG'][df_h2h['HomeTeam'] == home].sum() - df_h2h['FTAG'][df_h2h['HomeTeam'] == home].sum())*0.05
+    _, goal_diff = stats.as_host(home)
+    home_adv = 1 + goal_diff*0.05
     return max(0.8, min(home_adv, 1.2))  # ограничаваме корекцията
 
 # === Предсказване на мач с Poisson и Monte Carlo симулация ===
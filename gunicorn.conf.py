@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+
+def on_starting(server):
+    # споделената снимка се записва веднъж, в отделен процес - master-ът не зарежда
+    # данните, а workers я отварят read-only (виж analyzers/preload.py); ако не стане,
+    # всеки worker зарежда данните сам (по-бавно, но сървърът тръгва)
+    try:
+        subprocess.run([sys.executable, '-m', 'analyzers.preload'], check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        server.log.warning("Споделената снимка не е записана (%s) - workers ще заредят данните сами", e)
+
+
+def post_worker_init(worker):
+    # фоновото презареждане тръгва във всеки worker (нишките не оцеляват fork, затова
+    # не при import); данните и scipy се зареждат преди първата заявка,
+    # а при LAZY_START=1 - при първата заявка
+    import app
+    app.start_background_refresh()
+    if os.environ.get('LAZY_START') != '1':
+        app.warm_up()
@@ -0,0 +1,20 @@
+import base64
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTH = 'Basic ' + base64.b64encode(b'client1:password1').decode()
+
+# data/*.csv се търсят спрямо текущата директория, а app1.py се импортира от корена
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def client():
+    import app
+    client = app.app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = AUTH
+    return client
@@ -0,0 +1,121 @@
+import pytest
+
+
+def test_batch_and_predict_give_the_same_1x2(client):
+    # λ се изрязва в [0.1, 5] и в двата пътя - и при много неравни отбори
+    fixtures = [{'home': 'Antwerp', 'away': 'St. Gilloise'}, {'home': 'Arsenal', 'away': 'Chelsea'}]
+    batch = client.post('/api/batch', json={'fixtures': fixtures}).get_json()['predictions']
+    single = client.post('/api/predict', json={'fixtures': fixtures, 'markets': ['1x2']}).get_json()['predictions']
+    for b, s in zip(batch, single):
+        for key in ('lambda_home', 'lambda_away', 'prob_home', 'prob_draw', 'prob_away'):
+            assert b[key] == pytest.approx(s[key])
+
+
+@pytest.fixture
+def fresh_data(monkeypatch):
+    # собствена снимка за теста - live резултатите не изтичат към другите тестове
+    from analyzers import data
+    monkeypatch.setattr(data, 'dataset', data.Dataset())
+    return data
+
+
+def test_results_are_all_or_nothing(client, fresh_data):
+    before = client.get('/data/stats').get_json()['fingerprint']
+    results = [{'home': 'Arsenal', 'away': 'Chelsea', 'fthg': 2, 'ftag': 1, 'date': '2026-10-18'},
+               {'home': 'Arsenal', 'away': 'Chelsea', 'fthg': 'x', 'ftag': 1}]
+    response = client.post('/api/results', json={'results': results})
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+    assert client.get('/data/stats').get_json()['fingerprint'] == before
+
+
+def test_results_reject_unknown_teams(client, fresh_data):
+    before = fresh_data.dataset.current()
+    results = [{'home': 'Arsenal', 'away': 'Chelsea', 'fthg': 2, 'ftag': 1, 'date': '2026-10-18'},
+               {'home': 'Arsenal', 'away': 'No Such Team FC', 'fthg': 0, 'ftag': 0}]
+    response = client.post('/api/results', json={'results': results})
+    assert response.status_code == 400
+    assert 'No Such Team FC' in response.get_json()['error']
+    assert fresh_data.dataset.current() is before
+
+
+def test_results_are_ingested_in_one_swap(client, fresh_data):
+    results = [{'home': 'Arsenal', 'away': 'Chelsea', 'fthg': 2, 'ftag': 1, 'date': '2026-10-18'},
+               {'home': 'Liverpool', 'away': 'Everton', 'fthg': 1, 'ftag': 1, 'date': '2026-10-18'},
+               {'home': 'Arsenal', 'away': 'Chelsea', 'fthg': 2, 'ftag': 1, 'date': '2026-10-18'}]
+    response = client.post('/api/results', json={'results': results})
+    assert response.status_code == 200
+    assert response.get_json()['ingested'] == 2
+    assert len(fresh_data.dataset.current().leagues['E0'].ratings.live) == 2
+
+
+def test_requests_need_auth():
+    import app
+    assert app.app.test_client().get('/api/predict?home=Arsenal&away=Chelsea').status_code == 401
+
+
+def test_predict_single_fixture(client):
+    response = client.get('/api/predict', query_string={'home': 'Arsenal', 'away': 'Chelsea', 'markets': 'goals'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['prob_home'] + body['prob_draw'] + body['prob_away'] == pytest.approx(1.0)
+    assert set(body['markets']) == {'goals'}
+    assert body['verdict']
+
+
+@pytest.mark.parametrize('query', [{'home': 'Arsenal', 'away': 'Arsenal'}, {'home': 'Arsenal'}])
+def test_predict_rejects_invalid_pair(client, query):
+    assert client.get('/api/predict', query_string=query).status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/predict', '/api/batch'])
+@pytest.mark.parametrize('bad', ['Arsenal', {'home': 'Chelsea', 'away': 'Chelsea'}, {'home': 'Chelsea'}])
+def test_fixture_lists_report_the_bad_index(client, url, bad):
+    fixtures = [{'home': 'Arsenal', 'away': 'Chelsea'}, bad]
+    response = client.post(url, json={'fixtures': fixtures})
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+
+
+def test_batch_payload_errors(client):
+    assert client.post('/api/batch', json={'fixtures': 'Arsenal-Chelsea'}).status_code == 400
+    response = client.post('/api/batch', json={'fixtures': [], 'model': 'elo'})
+    assert response.status_code == 400
+
+
+def test_batch_predictions(client):
+    fixtures = [{'home': 'Arsenal', 'away': 'Chelsea'}, {'home': 'Liverpool', 'away': 'Everton'}]
+    for model in ('form', 'dixon_coles'):
+        response = client.post('/api/batch', json={'fixtures': fixtures, 'model': model})
+        assert response.status_code == 200
+        predictions = response.get_json()['predictions']
+        assert [(p['home'], p['away']) for p in predictions] == [('Arsenal', 'Chelsea'), ('Liverpool', 'Everton')]
+
+
+def test_report_and_stream_reject_same_team(client):
+    assert client.get('/api/report?home=Arsenal&away=Arsenal').status_code == 400
+    assert client.get('/stream?home=Arsenal&away=Arsenal').status_code == 400
+
+
+def test_team_search(client):
+    body = client.get('/api/teams?q=arsen').get_json()
+    assert {'id': 'Arsenal', 'text': 'Arsenal', 'league': 'E0'} in body['results']
+    assert client.get('/api/teams?q=a&league=XX').status_code == 400
+    assert client.get('/api/teams?q=a&page=x').status_code == 400
+
+
+def test_value_bets_are_plain_json(client):
+    bets = client.get('/api/value-bets?top=5').get_json()['value_bets']
+    assert len(bets) == 5
+    assert all(round(bet['odds'], 2) == bet['odds'] for bet in bets)
+    assert bets == sorted(bets, key=lambda bet: -bet['edge'])
+
+
+def test_predict_includes_head_to_head(client):
+    query = {'home': 'Liverpool', 'away': 'Bournemouth', 'markets': '1x2'}
+    h2h = client.get('/api/predict', query_string=query).get_json()['h2h']
+    assert 1 <= h2h['matches'] <= 5
+    assert all(0.8 <= value <= 1.2 for value in h2h['adjustment'])
+    # отбори без директни срещи в данните
+    query.update(home='Arsenal', away='Chelsea')
+    assert client.get('/api/predict', query_string=query).get_json()['h2h'] is None
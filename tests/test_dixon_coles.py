@@ -0,0 +1,23 @@
+from analyzers import dixon_coles
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("fit в пътя на заявката")
+
+
+def test_model_never_fits_without_stored_params(monkeypatch):
+    monkeypatch.setattr(dixon_coles, '_published', None)
+    monkeypatch.setattr(dixon_coles, 'load_params', lambda path=None: {})
+    monkeypatch.setattr(dixon_coles, 'fit', _fail)
+    dc = dixon_coles.model()
+    assert dc.leagues == {}
+    assert dc.params('E0', 'Arsenal', 'Chelsea') is None
+    assert dixon_coles.model() is dc
+
+
+def test_refit_publishes(monkeypatch):
+    published = dixon_coles.DixonColes({'E0': None})
+    monkeypatch.setattr(dixon_coles, '_published', None)
+    monkeypatch.setattr(dixon_coles, 'fit', lambda snapshot=None: (published, {}))
+    dixon_coles.refit()
+    assert dixon_coles.model() is published
@@ -0,0 +1,50 @@
+import importlib.util
+import math
+import os
+
+import pytest
+
+from conftest import ROOT
+
+APP_DIR = os.path.join(ROOT, 'football_predictor')
+
+
+def _load(name):
+    # football_predictor/ е отделно приложение: чете data/ от собствената си директория
+    cwd = os.getcwd()
+    os.chdir(APP_DIR)
+    try:
+        spec = importlib.util.spec_from_file_location(f'football_predictor_{name}', os.path.join(APP_DIR, f'{name}.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope='module')
+def fp_app():
+    return _load('app')
+
+
+@pytest.fixture(scope='module')
+def fp_app1():
+    return _load('app1')
+
+
+def test_h2h_correction_defaults_missing_host_to_one(fp_app):
+    # Arsenal не е бил домакин на Fulham в данните на приложението
+    home, away = fp_app.h2h_correction('Arsenal', 'Fulham')
+    assert home == 1.0 and not math.isnan(away)
+    assert fp_app.h2h_correction('Arsenal', 'No Such Team') == (1.0, 1.0)
+
+
+def test_h2h_adjustment_reads_the_index(fp_app1):
+    assert 0.8 <= fp_app1.h2h_adjustment('Arsenal', 'Fulham') <= 1.2
+    assert fp_app1.h2h_adjustment('Arsenal', 'No Such Team') == 1.0
+
+
+def test_index_post_has_no_nan(fp_app):
+    with fp_app.app.test_request_context():
+        html = fp_app.predict_match('Arsenal', 'Fulham')
+    assert 'nan' not in html.lower()
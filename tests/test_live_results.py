@@ -0,0 +1,38 @@
+import pandas as pd
+
+from analyzers import data
+from analyzers.ratings import RatingStore
+
+
+def _snapshot():
+    df = pd.DataFrame({
+        'Div': ['E0', 'E0'], 'League': ['E0', 'E0'],
+        'Date': pd.to_datetime(['2025-08-16 15:00', '2025-08-23 15:00']),
+        'HomeTeam': ['Chelsea', 'Arsenal'], 'AwayTeam': ['Arsenal', 'Chelsea'],
+        'FTHG': [1, 2], 'FTAG': [1, 0], 'File': ['E0.csv', 'E0.csv'],
+    })
+    return data.build_snapshot(df, {})
+
+
+def test_undated_results_for_same_pair_are_both_counted():
+    store = RatingStore(window=5)
+    store = store.with_results([('Chelsea', 'Arsenal', 1, 0, (None, 'Chelsea', 'Arsenal'))], live=True)
+    again = store.with_results([('Chelsea', 'Arsenal', 3, 0, (None, 'Chelsea', 'Arsenal'))], live=True)
+    assert again is not store
+    assert again.totals['FTHG'] == (4.0, 2)
+    assert len(again.live) == 2
+
+
+def test_dated_result_is_ingested_once(monkeypatch):
+    monkeypatch.setattr(data, 'dataset', data.Dataset(loader=_snapshot))
+    assert data.ingest_result('Chelsea', 'Arsenal', 2, 2, '2025-09-01')
+    assert not data.ingest_result('Chelsea', 'Arsenal', 2, 2, '2025-09-01')
+
+
+def test_ingest_two_undated_results_for_same_pair(monkeypatch):
+    monkeypatch.setattr(data, 'dataset', data.Dataset(loader=_snapshot))
+    assert data.ingest_result('Chelsea', 'Arsenal', 1, 0)
+    assert data.ingest_result('Chelsea', 'Arsenal', 3, 0)
+    snapshot = data.dataset.current()
+    assert len(snapshot.leagues['E0'].ratings.live) == 2
+    assert snapshot.head_to_head('Chelsea', 'Arsenal', last=None).matches == 4
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from analyzers.score_matrix import (asian_handicap_probs, btts_prob, dixon_coles_matrix, most_likely_score,
+                                    outcome_probs, over_probs, score_matrix)
+
+LAMBDAS = [(1.5, 1.1), (0.1, 5.0), (2.7, 0.4)]
+
+
+def _simulate(lambda_home, lambda_away, n=400_000, seed=0):
+    # старият Monte Carlo път на анализаторите, с голяма извадка
+    rng = np.random.default_rng(seed)
+    return rng.poisson(lambda_home, n), rng.poisson(lambda_away, n)
+
+
+@pytest.mark.parametrize('lambda_home, lambda_away', LAMBDAS)
+def test_matches_monte_carlo(lambda_home, lambda_away):
+    home, away = _simulate(lambda_home, lambda_away)
+    m = score_matrix(lambda_home, lambda_away)
+    expected = ((home > away).mean(), (home == away).mean(), (home < away).mean())
+    assert np.allclose(outcome_probs(m), expected, atol=4e-3)
+    assert btts_prob(m) == pytest.approx(((home > 0) & (away > 0)).mean(), abs=4e-3)
+    for line, p in over_probs(m).items():
+        assert p == pytest.approx((home + away > line).mean(), abs=4e-3)
+
+
+def test_matrix_is_a_distribution():
+    m = score_matrix(np.array([1.5, 0.1]), np.array([1.1, 5.0]))
+    assert m.shape[0] == 2
+    assert np.allclose(m.sum(axis=(1, 2)), 1.0)
+    assert np.allclose(np.stack(outcome_probs(m), axis=1).sum(axis=1), 1.0)
+
+
+def test_batched_equals_scalar():
+    homes, aways = zip(*LAMBDAS)
+    batched = np.stack(outcome_probs(score_matrix(np.array(homes), np.array(aways))), axis=1)
+    for row, (lambda_home, lambda_away) in zip(batched, LAMBDAS):
+        assert np.allclose(row, outcome_probs(score_matrix(lambda_home, lambda_away)))
+
+
+def test_handicap_and_most_likely_score():
+    m = score_matrix(1.5, 1.1)
+    win, push, lose = asian_handicap_probs(m, -0.5)
+    assert win == pytest.approx(outcome_probs(m)[0]) and push == 0
+    assert win + push + lose == pytest.approx(1.0)
+    score, p = most_likely_score(m)
+    assert tuple(score) == (1, 1) and p == pytest.approx(m[1, 1])
+
+
+def test_dixon_coles_with_zero_rho_is_poisson():
+    assert np.allclose(dixon_coles_matrix(1.5, 1.1, 0.0), score_matrix(1.5, 1.1))
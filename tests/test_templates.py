@@ -0,0 +1,46 @@
+import pytest
+
+# templates/index.html се рендерира и от app.py (SSE, търсене на отбори), и от app1.py (само `result`)
+
+
+@pytest.fixture(scope='module')
+def app1_client():
+    import app1
+    return app1.app.test_client()
+
+
+def test_app_index_get(client):
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'/api/teams' in response.data
+    assert b'EventSource' not in response.data
+
+
+def test_app_index_post_streams_the_other_analyzers(client):
+    response = client.post('/', data={'home_team': 'Arsenal', 'away_team': 'Chelsea'})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'Arsenal vs Chelsea' in body
+    assert 'Прогноза: ' in body
+    assert '/stream?' in body and 'skip=1x2' in body
+
+
+def test_app_index_post_same_team_shows_no_result(client):
+    response = client.post('/', data={'home_team': 'Arsenal', 'away_team': 'Arsenal'})
+    assert response.status_code == 200
+    assert b'EventSource' not in response.data
+
+
+def test_app1_index_get(app1_client):
+    response = app1_client.get('/')
+    assert response.status_code == 200
+    assert b'<option value="Arsenal"' in response.data
+
+
+def test_app1_index_post_renders_the_result(app1_client):
+    response = app1_client.post('/', data={'home_team': 'Arsenal', 'away_team': 'Chelsea'})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'Arsenal \\ud83c\\udd9a Chelsea' in body  # HTML-ът от predict_match през tojson
+    assert 'EventSource' not in body
+    assert 'let chance' not in body